@@ -1 +1,8 @@
 MINUTES_MULTIPLE_OF = 5
+MINUTES_IN_DAY = 24 * 60
+MAX_BATCH_AVAILABILITY_EVENTS = 50
+MAX_AVAILABLE_SLOTS_LIMIT = 500
+MAX_IMPORT_RESERVATIONS = 10000
+SOFT_HOLD_MINUTES = 10
+MAX_BUFFER_TIME_IN_MINUTES = 180
+MAX_EVENT_CAPACITY = 1000
@@ -15,3 +15,11 @@ class ReservationStatus(models.TextChoices):
     SOFT_RESERVED = "SOFT_RESERVED"
     RESERVED = "RESERVED"
     CANCELLED = "CANCELLED"
+
+
+class SchedulingType(models.TextChoices):
+    SINGLE_HOST = "SINGLE_HOST"
+    # Bookable only when every host of the event is free
+    COLLECTIVE = "COLLECTIVE"
+    # Bookable when any host is free, booked with the least loaded one
+    ROUND_ROBIN = "ROUND_ROBIN"
@@ -0,0 +1,12 @@
+from rest_framework import exceptions, status
+
+
+class SlotUnavailable(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Requested slot is not available, please try again"
+    default_code = "slot_unavailable"
+
+
+def is_constraint_violation(error, constraint_name):
+    diag = getattr(error.__cause__, "diag", None)
+    return diag is not None and diag.constraint_name == constraint_name
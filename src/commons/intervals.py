@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+SECONDS_IN_MINUTE = 60
+
+
+def to_epoch_minutes(dt, round_up=False):
+    seconds = int(dt.timestamp())
+    if round_up:
+        return -(-seconds // SECONDS_IN_MINUTE)
+    return seconds // SECONDS_IN_MINUTE
+
+
+def from_epoch_minutes(minutes):
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+def datetime_pairs_to_minutes(pairs):
+    # Unmerged starts and ends, rounded outwards to whole minutes
+    starts, ends = [], []
+    for start_datetime, end_datetime in pairs:
+        starts.append(to_epoch_minutes(start_datetime))
+        ends.append(to_epoch_minutes(end_datetime, round_up=True))
+    return np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+
+
+class IntervalSet:
+    """
+        Sorted, non-overlapping half-open [start, end) intervals stored as
+        int64 epoch-minute arrays. Every operation returns a new normalised set.
+    """
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, starts=(), ends=()):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_intervals(cls, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        non_empty = starts < ends
+        starts, ends = starts[non_empty], ends[non_empty]
+        if not len(starts):
+            return cls()
+
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        # Touching intervals are merged
+        running_end = np.maximum.accumulate(ends)
+        is_group_start = np.empty(len(starts), dtype=bool)
+        is_group_start[0] = True
+        is_group_start[1:] = starts[1:] > running_end[:-1]
+        group_starts = np.flatnonzero(is_group_start)
+        group_ends = np.append(group_starts[1:], len(starts)) - 1
+        return cls(starts[group_starts], running_end[group_ends])
+
+    @classmethod
+    def from_datetime_pairs(cls, pairs):
+        return cls.from_intervals(*datetime_pairs_to_minutes(pairs))
+
+    @classmethod
+    def from_datetime_intervals(cls, intervals):
+        return cls.from_datetime_pairs(
+            (interval["start_datetime"], interval["end_datetime"]) for interval in intervals
+        )
+
+    def to_datetime_intervals(self):
+        return [
+            {
+                "start_datetime": from_epoch_minutes(start),
+                "end_datetime": from_epoch_minutes(end),
+            }
+            for start, end in zip(self.starts, self.ends)
+        ]
+
+    def clip(self, min_minutes, max_minutes):
+        starts = np.maximum(self.starts, min_minutes)
+        ends = np.minimum(self.ends, max_minutes)
+        non_empty = starts < ends
+        return IntervalSet(starts[non_empty], ends[non_empty])
+
+    def with_buffer(self, before_minutes, after_minutes):
+        return IntervalSet.from_intervals(self.starts - before_minutes, self.ends + after_minutes)
+
+    def negate(self, min_minutes, max_minutes):
+        clipped = self.clip(min_minutes, max_minutes)
+        starts = np.concatenate(([min_minutes], clipped.ends))
+        ends = np.concatenate((clipped.starts, [max_minutes]))
+        non_empty = starts < ends
+        return IntervalSet(starts[non_empty], ends[non_empty])
+
+    def intersect(self, other):
+        return intersect_all([self, other])
+
+    def union(self, other):
+        return union_all([self, other])
+
+    def covers(self, starts, ends):
+        # Whether each [start, end) lies entirely inside one interval
+        starts = np.asarray(starts, dtype=np.int64)
+        if not len(self):
+            return np.zeros(len(starts), dtype=bool)
+        idx = np.searchsorted(self.starts, starts, side="right") - 1
+        return (idx >= 0) & (np.asarray(ends, dtype=np.int64) <= self.ends[np.maximum(idx, 0)])
+
+    def split_into_slots(self, origin_minutes, step_in_minutes, duration_in_minutes=None):
+        """
+            Returns the start minute of every slot of the grid anchored at
+            origin_minutes, one step apart, that fits entirely inside an
+            interval for duration_in_minutes (the step by default).
+        """
+        if duration_in_minutes is None:
+            duration_in_minutes = step_in_minutes
+        starts = origin_minutes - (origin_minutes - self.starts) // step_in_minutes * step_in_minutes
+        slot_counts = np.maximum((self.ends - duration_in_minutes - starts) // step_in_minutes + 1, 0)
+        total = int(slot_counts.sum())
+        first_slot_index = np.repeat(np.cumsum(slot_counts) - slot_counts, slot_counts)
+        slot_index_in_interval = np.arange(total, dtype=np.int64) - first_slot_index
+        return np.repeat(starts, slot_counts) + step_in_minutes * slot_index_in_interval
+
+
+def count_overlaps(starts, ends):
+    """
+        Counting sweep line over possibly overlapping [start, end) intervals.
+        Returns the sorted boundaries and the number of intervals covering
+        [points[i], points[i + 1]). Ends sort before starts at the same
+        minute so that touching intervals do not count as overlapping.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    points = np.concatenate((starts, ends))
+    deltas = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)))
+    order = np.lexsort((deltas, points))
+    return points[order], np.cumsum(deltas[order])
+
+
+def covered_at_depth(starts, ends, min_depth):
+    # Time covered by at least min_depth of the intervals
+    points, depth = count_overlaps(starts, ends)
+    if not len(points):
+        return IntervalSet()
+    selected = (depth[:-1] >= min_depth) & (points[:-1] < points[1:])
+    return IntervalSet.from_intervals(points[:-1][selected], points[1:][selected])
+
+
+def max_overlaps(starts, ends, window_starts, window_ends):
+    """
+        Returns the most intervals covering any minute of each
+        [window_start, window_end) window, windows must not be empty.
+    """
+    points, depth = count_overlaps(starts, ends)
+    # Padded so that index 0 is the depth before the first boundary and the
+    # last index is valid for reduceat.
+    depth = np.concatenate(([0], depth, [0]))
+    first_segments = np.searchsorted(points, window_starts, side="right")
+    last_segments = np.searchsorted(points, window_ends, side="left") + 1
+    bounds = np.stack((first_segments, last_segments), axis=1).ravel()
+    return np.maximum.reduceat(depth, bounds)[::2]
+
+
+def _covered_segments(interval_sets, min_depth):
+    return covered_at_depth(
+        np.concatenate([interval_set.starts for interval_set in interval_sets]),
+        np.concatenate([interval_set.ends for interval_set in interval_sets]),
+        min_depth
+    )
+
+
+def intersect_all(interval_sets):
+    if not interval_sets:
+        return IntervalSet()
+    return _covered_segments(interval_sets, min_depth=len(interval_sets))
+
+
+def union_all(interval_sets):
+    if not interval_sets:
+        return IntervalSet()
+    return _covered_segments(interval_sets, min_depth=1)
@@ -0,0 +1,100 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+        Forward cursor pagination on an (ordering field, unique tie breaker)
+        pair. The cursor holds the key of the last row served, so every page
+        is an index range scan instead of an OFFSET.
+    """
+    ordering = ("created_at", "id")
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.next_key = None
+        field, tie_field = self.ordering
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(field, tie_field)
+        key = self.decode_cursor(request)
+        if key is not None:
+            value, tie_value = key
+            # The plain range on the ordering field bounds the index scan,
+            # the OR only resolves ties within it.
+            try:
+                queryset = queryset.filter(**{"{}__gte".format(field): value}).filter(
+                    Q(**{"{}__gt".format(field): value})
+                    | Q(**{field: value, "{}__gt".format(tie_field): tie_value})
+                )
+            except (DjangoValidationError, TypeError, ValueError):
+                raise exceptions.NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_key = (getattr(rows[-1], field), getattr(rows[-1], tie_field))
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_key)
+        )
+
+    def encode_cursor(self, key):
+        data = json.dumps(key, cls=encoders.JSONEncoder).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            key = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != 2:
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        return key
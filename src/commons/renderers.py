@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+        Newline delimited JSON, one line per list item. Views stream their
+        successful responses themselves; this renders the rest (e.g. errors).
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        items = data if isinstance(data, list) else [data]
+        return b"".join(to_ndjson_line(item) for item in items)
+
+
+class CompactJSONRenderer(renderers.JSONRenderer):
+    """
+        Plain JSON under its own format and media type, so that views can
+        pick their compact representation through ?format=compact or the
+        Accept header.
+    """
+    media_type = "application/vnd.eventchimp.compact+json"
+    format = "compact"
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+        Views stream their successful exports themselves; this renders the
+        rest (e.g. errors) as field, message rows.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+        writer.writerows(
+            (key, " ".join(map(str, value)) if isinstance(value, list) else value)
+            for key, value in items
+        )
+        return buffer.getvalue().encode("utf-8")
+
+
+class ICalendarRenderer(renderers.BaseRenderer):
+    """
+        Views stream their calendars themselves; errors are rendered as
+        plain JSON.
+    """
+    media_type = "text/calendar"
+    format = "ics"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, cls=encoders.JSONEncoder).encode("utf-8")
+
+
+def to_ndjson_line(item):
+    return (json.dumps(item, cls=encoders.JSONEncoder) + "\n").encode("utf-8")
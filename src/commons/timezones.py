@@ -0,0 +1,109 @@
+import functools
+
+import numpy as np
+
+from commons.constants import MINUTES_IN_DAY
+from commons.intervals import from_epoch_minutes
+
+
+# Offset tables are built and cached per block of this many days
+TABLE_BLOCK_MINUTES = 366 * MINUTES_IN_DAY
+# Zones do not change their offset more than once within this many minutes
+SAMPLE_MINUTES = 6 * 60
+
+
+def get_utc_offset(minutes, zone):
+    return int(from_epoch_minutes(minutes).astimezone(zone).utcoffset().total_seconds()) // 60
+
+
+@functools.lru_cache(maxsize=1024)
+def get_offset_table(zone, block):
+    """
+        Returns the epoch minutes at which the UTC offset of the zone changes
+        within the block, starting with the block start, and the offset in
+        minutes from each of them on.
+    """
+    block_start = block * TABLE_BLOCK_MINUTES
+    transitions = [block_start]
+    offsets = [get_utc_offset(block_start, zone)]
+    for sample in range(block_start + SAMPLE_MINUTES, block_start + TABLE_BLOCK_MINUTES + 1, SAMPLE_MINUTES):
+        offset = get_utc_offset(sample, zone)
+        if offset == offsets[-1]:
+            continue
+        low, high = sample - SAMPLE_MINUTES, sample
+        while high - low > 1:
+            middle = (low + high) // 2
+            if get_utc_offset(middle, zone) == offsets[-1]:
+                low = middle
+            else:
+                high = middle
+        transitions.append(high)
+        offsets.append(offset)
+    return np.array(transitions, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def get_utc_offsets(minutes, zone):
+    """
+        UTC offset in minutes of the zone at each epoch minute of the array.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    if not len(minutes):
+        return np.empty(0, dtype=np.int64)
+
+    first_block = int(minutes.min()) // TABLE_BLOCK_MINUTES
+    last_block = int(minutes.max()) // TABLE_BLOCK_MINUTES
+    tables = [get_offset_table(zone, block) for block in range(first_block, last_block + 1)]
+    transitions = np.concatenate([table_transitions for table_transitions, _ in tables])
+    offsets = np.concatenate([table_offsets for _, table_offsets in tables])
+    return offsets[np.searchsorted(transitions, minutes, side="right") - 1]
+
+
+def format_offset(offset_minutes):
+    # Same as DRF, which renders a zero offset as "Z"
+    if offset_minutes == 0:
+        return "Z"
+    sign = "-" if offset_minutes < 0 else "+"
+    hours, minutes = divmod(abs(int(offset_minutes)), 60)
+    return "{}{:02d}:{:02d}".format(sign, hours, minutes)
+
+
+def format_local_datetimes(local_minutes, offsets):
+    """
+        ISO 8601 strings of local epoch minutes with their UTC offsets.
+    """
+    if not len(local_minutes):
+        return []
+    unique_offsets, offset_indexes = np.unique(offsets, return_inverse=True)
+    suffixes = np.array([format_offset(offset) for offset in unique_offsets])[offset_indexes]
+    datetimes = np.datetime_as_string(np.asarray(local_minutes, dtype="datetime64[m]"), unit="s")
+    return np.char.add(datetimes, suffixes).tolist()
+
+
+def split_by_local_date(minutes, zone):
+    """
+        Splits sorted epoch minutes by their local date in the zone. Returns
+        the ISO dates, the start and end index of each date's run of minutes
+        and the UTC offset of every minute.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    offsets = get_utc_offsets(minutes, zone)
+    local_days = (minutes + offsets) // MINUTES_IN_DAY
+    boundaries = np.flatnonzero(np.diff(local_days)) + 1
+    group_starts = np.concatenate(([0], boundaries)) if len(minutes) else np.empty(0, dtype=np.int64)
+    group_ends = np.append(boundaries, len(minutes))
+    dates = np.datetime_as_string(local_days[group_starts].astype("datetime64[D]")).tolist()
+    return dates, group_starts, group_ends, offsets
+
+
+def group_by_local_date(minutes, zone):
+    """
+        Returns a list of (ISO date, ISO local datetimes) pairs of sorted
+        epoch minutes.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    dates, group_starts, group_ends, offsets = split_by_local_date(minutes, zone)
+    datetimes = format_local_datetimes(minutes + offsets, offsets)
+    return [
+        (group_date, datetimes[group_start:group_end])
+        for group_date, group_start, group_end in zip(dates, group_starts, group_ends)
+    ]
@@ -15,19 +15,5 @@ def generate_random_string(length):
     return "".join(random_list)
 
 
-def merge_datetime_intervals(intervals):
-    if len(intervals) <= 1:
-        return intervals
-    merged = []
-    intervals.sort(key=lambda x: x["start_datetime"])
-    for interval in intervals:
-        if not merged or merged[-1]["end_datetime"] < interval["start_datetime"]:
-            merged.append(interval)
-        else:
-            if interval["end_datetime"] > merged[-1]["end_datetime"]:
-                merged[-1]["end_datetime"] = interval["end_datetime"]
-    return merged
-
-
 def get_start_of_day(dt, tz="utc"):
     return timezone.datetime.combine(dt, time(0, 0), ZoneInfo(tz))
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "events",
     "schedules",
@@ -90,6 +91,22 @@ DATABASES = {
     ),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "DJANGO_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("DJANGO_CACHE_LOCATION", default="eventchimp"),
+    },
+}
+
+# Entries are keyed by the event's availability version, so the timeout only
+# bounds memory use, stale entries are never served.
+AVAILABILITY_CACHE_TIMEOUT = config("AVAILABILITY_CACHE_TIMEOUT", cast=int, default=3600)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
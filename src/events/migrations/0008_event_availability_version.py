@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_event_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='availability_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
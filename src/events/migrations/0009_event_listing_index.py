@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_availability_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['organiser', 'created_at', 'id'], name='event_organiser_listing_idx'),
+        ),
+    ]
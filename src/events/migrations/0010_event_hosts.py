@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0004_customdateschedule_range_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0009_event_listing_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='scheduling_type',
+            field=models.CharField(choices=[('SINGLE_HOST', 'Single Host'), ('COLLECTIVE', 'Collective')], default='SINGLE_HOST'),
+        ),
+        migrations.CreateModel(
+            name='EventHost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hosts', to='events.event')),
+                ('schedule', models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='schedules.schedule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hosted_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('event', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_hosts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventhost',
+            name='booking_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='scheduling_type',
+            field=models.CharField(choices=[('SINGLE_HOST', 'Single Host'), ('COLLECTIVE', 'Collective'), ('ROUND_ROBIN', 'Round Robin')], default='SINGLE_HOST'),
+        ),
+        migrations.AddIndex(
+            model_name='eventhost',
+            index=models.Index(fields=['event', 'booking_count', 'id'], name='event_host_load_idx'),
+        ),
+    ]
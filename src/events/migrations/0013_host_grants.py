@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-17 18:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def grant_existing_hosts(apps, schema_editor):
+    # Hosts added before grants existed keep being allowed
+    EventHost = apps.get_model("events", "EventHost")
+    HostGrant = apps.get_model("events", "HostGrant")
+    pairs = EventHost.objects.exclude(
+        user_id=models.F("event__organiser_id")
+    ).values_list("user_id", "event__organiser_id").distinct()
+    HostGrant.objects.bulk_create(
+        [HostGrant(user_id=user_id, organiser_id=organiser_id) for user_id, organiser_id in pairs.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0012_event_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organiser', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='granted_hosts', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='host_grants', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'organiser')},
+            },
+        ),
+        migrations.RunPython(grant_existing_hosts, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,19 @@
 from django.db import models
+from django.db.models.functions import Greatest
 from django.utils.text import slugify
 from django.conf import settings
 
+from commons.enums import SchedulingType
+from commons.intervals import to_epoch_minutes
 from commons.utils import generate_random_string
 from schedules.models import Schedule
+from .signals import event_blocking_changed
 
 
 class Event(models.Model):
+    # Fields that decide the time the event's reservations block
+    BLOCKING_FIELDS = ("before_buffer_time_in_minutes", "after_buffer_time_in_minutes", "capacity")
+
     organiser = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=120)
     slug = models.SlugField(blank=True)
@@ -20,16 +27,60 @@ class Event(models.Model):
     after_buffer_time_in_minutes = models.PositiveIntegerField(default=0)
     notice_in_minutes = models.PositiveIntegerField(default=0)
     schedule = models.ForeignKey(Schedule, on_delete=models.SET_NULL, null=True, default=None)
+    scheduling_type = models.CharField(choices=SchedulingType.choices, default=SchedulingType.SINGLE_HOST)
+    # Attendees per slot, group slots stay bookable until they are full
+    capacity = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
+    availability_version = models.PositiveIntegerField(default=0, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['organiser', 'slug']
+        indexes = [
+            # Keyset pagination of an organiser's active events
+            models.Index(
+                fields=["organiser", "created_at", "id"],
+                name="event_organiser_listing_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in cls.BLOCKING_FIELDS):
+            instance._loaded_blocking_values = instance.get_blocking_values()
+        return instance
 
     def get_owner_id(self):
         return self.organiser_id
 
+    def get_blocking_values(self):
+        return tuple(getattr(self, field) for field in self.BLOCKING_FIELDS)
+
+    def has_blocking_changes(self):
+        # Unknown when the instance was not loaded with the fields
+        loaded_values = getattr(self, "_loaded_blocking_values", None)
+        return loaded_values is None or loaded_values != self.get_blocking_values()
+
+    def has_hosts(self):
+        # Hosted events take their schedules and busy time from their hosts
+        return self.scheduling_type != SchedulingType.SINGLE_HOST
+
+    def is_group_event(self):
+        return self.capacity > 1
+
+    def get_slot_grid_origin(self):
+        # Slots start a whole number of steps after the event start, whatever
+        # range or timezone they are looked up with.
+        return to_epoch_minutes(self.start_datetime, round_up=True)
+
+    def get_booking_gap_in_minutes(self):
+        # The after buffer of the earlier booking and the before buffer of
+        # the later one both have to fit between two bookings.
+        return self.before_buffer_time_in_minutes + self.after_buffer_time_in_minutes
+
     def soft_delete(self):
         self.is_active = False
         self.save(
@@ -46,7 +97,91 @@ class Event(models.Model):
             i += 1
         return slug
 
+    @classmethod
+    def bump_availability_version(cls, **filters):
+        cls.objects.filter(**filters).update(
+            availability_version=models.F("availability_version") + 1
+        )
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = self.generate_slug()
+        is_update = not self._state.adding
+        is_blocking_changed = is_update and self.has_blocking_changes()
+        if is_update:
+            # Incremented in the database so that a stale instance can never
+            # write back an older version than the one cached against.
+            self.availability_version = models.F("availability_version") + 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = [*update_fields, "availability_version"]
         super().save(*args, **kwargs)
+        if is_update:
+            self.refresh_from_db(fields=["availability_version"])
+        self._loaded_blocking_values = self.get_blocking_values()
+        if is_blocking_changed:
+            event_blocking_changed.send(sender=Event, event=self)
+
+
+class EventHost(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="hosts")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="hosted_events")
+    # The host's own working hours
+    schedule = models.ForeignKey(Schedule, on_delete=models.SET_NULL, null=True, default=None)
+    # Round robin bookings assigned to the host, the least loaded free host
+    # gets the next one.
+    booking_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        unique_together = ["event", "user"]
+        indexes = [
+            models.Index(fields=["event", "booking_count", "id"], name="event_host_load_idx"),
+        ]
+
+    @classmethod
+    def assign_least_loaded(cls, event_id, user_ids):
+        """
+            Picks the free host with the fewest bookings and counts the new
+            one. Returns the host's user id, or None when no host is given.
+        """
+        host = cls.objects.select_for_update().filter(
+            event_id=event_id,
+            user_id__in=user_ids
+        ).order_by("booking_count", "id").only("id", "user_id").first()
+        if host is None:
+            return None
+        cls.objects.filter(pk=host.pk).update(booking_count=models.F("booking_count") + 1)
+        return host.user_id
+
+    @classmethod
+    def release_bookings(cls, event_id, user_id, count=1):
+        # Round robin bookings of the host that stopped being active
+        cls.objects.filter(event_id=event_id, user_id=user_id).update(
+            booking_count=Greatest(models.F("booking_count") - count, 0)
+        )
+
+
+class HostGrant(models.Model):
+    # A user lets an organiser add them as a host of the organiser's events
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="host_grants")
+    organiser = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="granted_hosts")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ["user", "organiser"]
+
+    def get_owner_id(self):
+        return self.user_id
+
+    @classmethod
+    def get_granted_user_ids(cls, organiser_id, user_ids):
+        """
+            Returns the ids among `user_ids` that the organiser may add as
+            hosts, the organiser themselves and users who granted it.
+        """
+        granted_user_ids = set(cls.objects.filter(
+            organiser_id=organiser_id,
+            user_id__in=user_ids
+        ).values_list("user_id", flat=True))
+        granted_user_ids.add(organiser_id)
+        return granted_user_ids
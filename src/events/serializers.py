@@ -2,15 +2,52 @@ from rest_framework import serializers
 
 from commons.serializerfields import AutoTzDateTimeField
 from commons.validators import MinutesMultipleOfValidator
-from commons.constants import MINUTES_MULTIPLE_OF
+from commons.constants import MINUTES_MULTIPLE_OF, MAX_BUFFER_TIME_IN_MINUTES, MAX_EVENT_CAPACITY
+from commons.enums import SchedulingType
+from commons.exceptions import is_constraint_violation
+from reservations.models import BLOCKED_RANGE_CONSTRAINT, HOST_BLOCKED_RANGE_CONSTRAINT
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Event
+from .models import Event, EventHost, HostGrant
 
 
 def get_default_end_datetime():
     return timezone.now() + timezone.timedelta(days=3650)
 
 
+class EventHostSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EventHost
+        fields = ("user", "schedule")
+
+    def validate(self, data):
+        schedule = data.get("schedule")
+        if schedule is not None and schedule.user_id != data["user"].id:
+            raise serializers.ValidationError(f"Schedule {schedule.id} does not belong to the host")
+        return data
+
+
+class HostGrantSerializer(serializers.ModelSerializer):
+    created_at = AutoTzDateTimeField(read_only=True)
+
+    class Meta:
+        model = HostGrant
+        fields = ("id", "organiser", "created_at")
+        read_only_fields = ("id", "created_at")
+
+    def validate_organiser(self, organiser):
+        user = self.context["request"].user
+        if organiser.id == user.id:
+            raise serializers.ValidationError("Organisers can always add themselves as hosts.")
+        if HostGrant.objects.filter(user=user, organiser=organiser).exists():
+            raise serializers.ValidationError("Organiser can already add you as a host.")
+        return organiser
+
+    def save(self, *args, **kwargs):
+        self.validated_data["user"] = self.context["request"].user
+        return super().save(*args, **kwargs)
+
+
 class EventSerializer(serializers.ModelSerializer):
     duration_in_minutes = serializers.IntegerField(
         min_value=MINUTES_MULTIPLE_OF,
@@ -24,13 +61,13 @@ class EventSerializer(serializers.ModelSerializer):
     )
     before_buffer_time_in_minutes = serializers.IntegerField(
         min_value=0,
-        max_value=180,
+        max_value=MAX_BUFFER_TIME_IN_MINUTES,
         default=0,
         validators=[MinutesMultipleOfValidator()]
     )
     after_buffer_time_in_minutes = serializers.IntegerField(
         min_value=0,
-        max_value=180,
+        max_value=MAX_BUFFER_TIME_IN_MINUTES,
         default=0,
         validators=[MinutesMultipleOfValidator()]
     )
@@ -43,8 +80,10 @@ class EventSerializer(serializers.ModelSerializer):
     start_datetime = AutoTzDateTimeField(validators=[MinutesMultipleOfValidator()])
     end_datetime = AutoTzDateTimeField(default=get_default_end_datetime)
     rolling_days = serializers.IntegerField(allow_null=True, min_value=1, max_value=366)
-    created_at = AutoTzDateTimeField()
-    updated_at = AutoTzDateTimeField()
+    capacity = serializers.IntegerField(min_value=1, max_value=MAX_EVENT_CAPACITY, default=1)
+    created_at = AutoTzDateTimeField(read_only=True)
+    updated_at = AutoTzDateTimeField(read_only=True)
+    hosts = EventHostSerializer(many=True, required=False)
 
     class Meta:
         model = Event
@@ -63,6 +102,9 @@ class EventSerializer(serializers.ModelSerializer):
             'after_buffer_time_in_minutes',
             'notice_in_minutes',
             'schedule',
+            'scheduling_type',
+            'capacity',
+            'hosts',
             'created_at',
             'updated_at',
         )
@@ -75,8 +117,8 @@ class EventSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, data):
-        start_datetime = data.get('start_datetime')
-        end_datetime = data.get('end_datetime')
+        start_datetime = data.get('start_datetime', getattr(self.instance, 'start_datetime', None))
+        end_datetime = data.get('end_datetime', getattr(self.instance, 'end_datetime', None))
         curr_datetime = timezone.now()
 
         if curr_datetime > end_datetime:
@@ -85,8 +127,70 @@ class EventSerializer(serializers.ModelSerializer):
         if start_datetime >= end_datetime:
             raise serializers.ValidationError("End datetime must be after start datetime.")
 
+        scheduling_type = data.get(
+            "scheduling_type",
+            getattr(self.instance, "scheduling_type", SchedulingType.SINGLE_HOST)
+        )
+        hosts = data.get("hosts")
+        if hosts is None and self.instance is not None:
+            hosts = list(self.instance.hosts.all())
+        host_user_ids = [host["user"].id if isinstance(host, dict) else host.user_id for host in hosts or []]
+        if scheduling_type != SchedulingType.SINGLE_HOST and not host_user_ids:
+            raise serializers.ValidationError("Collective and round robin events need at least one host.")
+        if len(set(host_user_ids)) != len(host_user_ids):
+            raise serializers.ValidationError("Hosts should be unique.")
+        if data.get("hosts"):
+            # Users are added as hosts of someone else's events only after
+            # granting that organiser.
+            organiser_id = self.context["request"].user.id
+            granted_user_ids = HostGrant.get_granted_user_ids(organiser_id, host_user_ids)
+            not_granted_user_ids = [user_id for user_id in host_user_ids if user_id not in granted_user_ids]
+            if not_granted_user_ids:
+                raise serializers.ValidationError(
+                    f"Users {not_granted_user_ids} have not allowed you to add them as a host."
+                )
+
+        capacity = data.get("capacity", getattr(self.instance, "capacity", 1))
+        if capacity > 1 and scheduling_type != SchedulingType.SINGLE_HOST:
+            raise serializers.ValidationError("Only single host events can take more than one attendee per slot.")
+
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        hosts = validated_data.pop("hosts", [])
+        event = super().create(validated_data)
+        EventHost.objects.bulk_create([EventHost(event=event, **host) for host in hosts])
+        return event
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        hosts = validated_data.pop("hosts", None)
+        # Saving the event bumps its availability version and recomputes the
+        # ranges its reservations block when buffers or capacity change.
+        try:
+            with transaction.atomic():
+                event = super().update(instance, validated_data)
+        except IntegrityError as ex:
+            if not (
+                is_constraint_violation(ex, BLOCKED_RANGE_CONSTRAINT)
+                or is_constraint_violation(ex, HOST_BLOCKED_RANGE_CONSTRAINT)
+            ):
+                raise
+            raise serializers.ValidationError(
+                "Existing reservations would overlap with the new buffers or capacity."
+            )
+        if hosts is not None:
+            # Kept hosts keep their round robin booking counts
+            event.hosts.exclude(user__in=[host["user"] for host in hosts]).delete()
+            for host in hosts:
+                EventHost.objects.update_or_create(
+                    event=event,
+                    user=host["user"],
+                    defaults={"schedule": host.get("schedule")}
+                )
+        return event
+
     def save(self, *args, **kwargs):
         self.validated_data['organiser'] = self.context['request'].user
         return super().save(*args, **kwargs)
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent with an `event` argument once an event was saved with changed buffers
+# or capacity, which decide the time its reservations block.
+event_blocking_changed = Signal()
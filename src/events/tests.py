@@ -1,3 +1,135 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from commons.enums import SchedulingType
+from .models import Event, EventHost, HostGrant
+
+
+class EventQueryCountTest(TestCase):
+    EVENT_COUNT = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        start_datetime = timezone.now().replace(minute=0, second=0, microsecond=0)
+        cls.events = Event.objects.bulk_create([
+            Event(
+                organiser=cls.user,
+                title="Event {}".format(i),
+                slug="event-{}".format(i),
+                start_datetime=start_datetime,
+                end_datetime=start_datetime + timezone.timedelta(days=30),
+            )
+            for i in range(cls.EVENT_COUNT)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        # Events, then the hosts of all of them
+        with self.assertNumQueries(2):
+            resp = self.client.get("/event-service/api/events", {"timezone": "Asia/Kolkata"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["results"]), self.EVENT_COUNT)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(2):
+            resp = self.client.get("/event-service/api/events/{}".format(self.events[0].id))
+        self.assertEqual(resp.status_code, 200)
+
+
+class EventPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        start_datetime = timezone.now().replace(minute=0, second=0, microsecond=0)
+        cls.events = Event.objects.bulk_create([
+            Event(
+                organiser=cls.user,
+                title="Event {}".format(i),
+                slug="event-{}".format(i),
+                start_datetime=start_datetime,
+                end_datetime=start_datetime + timezone.timedelta(days=30),
+            )
+            for i in range(5)
+        ])
+        # Ties on created_at are broken by id
+        Event.objects.filter(pk__in=[event.pk for event in cls.events[:3]]).update(created_at=start_datetime)
+
+    def test_pages_cover_every_event_once(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url, listed_ids = "/event-service/api/events?timezone=UTC&page_size=2", []
+        while url is not None:
+            resp = client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            listed_ids += [event["id"] for event in resp.json()["results"]]
+            url = resp.json()["next"]
+        self.assertEqual(
+            listed_ids,
+            list(Event.objects.order_by("created_at", "id").values_list("id", flat=True))
+        )
+
+
+class EventHostPermissionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        cls.other_user = get_user_model().objects.create_user(username="other", password="password")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_event(self, host_ids):
+        start_datetime = timezone.now().replace(minute=0, second=0, microsecond=0) + timezone.timedelta(hours=1)
+        return self.client.post(
+            "/event-service/api/events",
+            {
+                "title": "Collective",
+                "duration_in_minutes": 30,
+                "step_in_minutes": 30,
+                "start_datetime": start_datetime.isoformat(),
+                "rolling_days": None,
+                "scheduling_type": SchedulingType.COLLECTIVE,
+                "hosts": [{"user": host_id} for host_id in host_ids],
+            },
+            format="json"
+        )
+
+    def test_organiser_can_host(self):
+        resp = self.create_event([self.user.id])
+        self.assertEqual(resp.status_code, 201)
+
+    def test_user_without_grant_can_not_be_added(self):
+        resp = self.create_event([self.user.id, self.other_user.id])
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(EventHost.objects.filter(user=self.other_user).exists())
+
+    def test_user_with_grant_can_be_added(self):
+        other_client = APIClient()
+        other_client.force_authenticate(self.other_user)
+        resp = other_client.post("/event-service/api/host-grants", {"organiser": self.user.id}, format="json")
+        self.assertEqual(resp.status_code, 201)
+
+        resp = self.create_event([self.user.id, self.other_user.id])
+        self.assertEqual(resp.status_code, 201)
+
+    def test_revoked_grant(self):
+        grant = HostGrant.objects.create(user=self.other_user, organiser=self.user)
+        other_client = APIClient()
+        other_client.force_authenticate(self.other_user)
+        resp = other_client.delete("/event-service/api/host-grants/{}".format(grant.id))
+        self.assertEqual(resp.status_code, 204)
+
+        resp = self.create_event([self.other_user.id])
+        self.assertEqual(resp.status_code, 400)
+
+    def test_organiser_can_not_grant_for_others(self):
+        grant = HostGrant.objects.create(user=self.other_user, organiser=self.user)
+        resp = self.client.delete("/event-service/api/host-grants/{}".format(grant.id))
+        self.assertEqual(resp.status_code, 404)
@@ -2,17 +2,23 @@ from rest_framework import viewsets, status, response
 from rest_framework.routers import DefaultRouter
 
 
+from commons.pagination import KeysetPagination
 from commons.permissions import IsOwner
-from .serializers import EventSerializer
-from .models import Event
+from .serializers import EventSerializer, HostGrantSerializer
+from .models import Event, HostGrant
+
+
+class EventPagination(KeysetPagination):
+    ordering = ("created_at", "id")
 
 
 class EventViewset(viewsets.ModelViewSet):
     serializer_class = EventSerializer
     permission_classes = [IsOwner]
+    pagination_class = EventPagination
 
     def get_queryset(self):
-        return Event.objects.filter(organiser=self.request.user, is_active=True)
+        return Event.objects.filter(organiser=self.request.user, is_active=True).prefetch_related("hosts")
 
     def destroy(self, request, *args, **kwargs):
         event = self.get_object()
@@ -20,5 +26,16 @@ class EventViewset(viewsets.ModelViewSet):
         return response.Response({}, status=status.HTTP_204_NO_CONTENT)
 
 
+class HostGrantViewset(viewsets.ModelViewSet):
+    # Organisers the requesting user lets add them as a host
+    http_method_names = ("get", "post", "delete", "options")
+    serializer_class = HostGrantSerializer
+    permission_classes = [IsOwner]
+
+    def get_queryset(self):
+        return HostGrant.objects.filter(user=self.request.user).order_by("id")
+
+
 event_router = DefaultRouter(trailing_slash=False)
 event_router.register(r'events', EventViewset, basename='events')
+event_router.register(r'host-grants', HostGrantViewset, basename='host-grants')
@@ -0,0 +1,103 @@
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Reservation, ArchivedReservation, DailyAvailability
+
+
+ARCHIVE_COLUMNS = (
+    "id",
+    "event_id",
+    "status",
+    "start_datetime",
+    "end_datetime",
+    "attendee_full_name",
+    "attendee_email",
+    "is_active",
+    "host_id",
+    "expires_at",
+    "hold_token",
+    "created_at",
+    "updated_at",
+)
+
+
+def get_month_start(value):
+    return value.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_next_month_start(month_start):
+    return (month_start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def get_archive_cutoff(months):
+    """
+        Start of the month `months` months before the current one.
+        Reservations over before it are archived.
+    """
+    cutoff = get_month_start(timezone.now())
+    for _ in range(months):
+        cutoff = get_month_start(cutoff - datetime.timedelta(days=1))
+    return cutoff
+
+
+def get_archive_partition_name(month_start):
+    return "{}_y{:04d}m{:02d}".format(ArchivedReservation._meta.db_table, month_start.year, month_start.month)
+
+
+def create_archive_partitions(start_datetime, end_datetime):
+    """
+        Creates the monthly partitions of the archive covering the range, a
+        no-op on databases without declarative partitioning.
+    """
+    if connection.vendor != "postgresql":
+        return
+    table = ArchivedReservation._meta.db_table
+    month_start = get_month_start(start_datetime)
+    with connection.cursor() as cursor:
+        while month_start <= end_datetime:
+            next_month_start = get_next_month_start(month_start)
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)".format(
+                    connection.ops.quote_name(get_archive_partition_name(month_start)),
+                    connection.ops.quote_name(table),
+                ),
+                [month_start, next_month_start]
+            )
+            month_start = next_month_start
+
+
+@transaction.atomic
+def archive_reservations(cutoff, batch_size):
+    """
+        Moves up to batch_size reservations that ended before the cutoff to
+        the archive. Returns the number of reservations moved.
+    """
+    rows = list(
+        Reservation.objects.filter(end_datetime__lt=cutoff)
+        .order_by("end_datetime", "id")
+        .select_for_update(skip_locked=True)
+        .values_list(*ARCHIVE_COLUMNS)[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    start_datetime_index = ARCHIVE_COLUMNS.index("start_datetime")
+    create_archive_partitions(
+        min(row[start_datetime_index] for row in rows),
+        max(row[start_datetime_index] for row in rows)
+    )
+    ArchivedReservation.objects.bulk_create([
+        ArchivedReservation(**dict(zip(ARCHIVE_COLUMNS, row)))
+        for row in rows
+    ])
+    # Past reservations never affect availability, their delete signals
+    # return early.
+    Reservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def prune_stored_days(cutoff):
+    deleted_count, _ = DailyAvailability.objects.filter(day__lt=cutoff.date()).delete()
+    return deleted_count
@@ -1,12 +1,49 @@
+import hashlib
+import heapq
 import json
+from itertools import groupby
+from operator import itemgetter
 
+import numpy as np
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.http import quote_etag
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 
 from reservations.models import Reservation
-from events.models import Event
-from commons.utils import merge_datetime_intervals, get_start_of_day
+from events.models import Event, EventHost
+from schedules.models import CustomDateSchedule
+from commons.enums import ReservationStatus, SchedulingType
+from commons.utils import get_start_of_day
+from commons.constants import MINUTES_IN_DAY, MINUTES_MULTIPLE_OF, MAX_BUFFER_TIME_IN_MINUTES
+from commons.intervals import (
+    IntervalSet,
+    covered_at_depth,
+    datetime_pairs_to_minutes,
+    max_overlaps,
+    to_epoch_minutes,
+    from_epoch_minutes,
+)
+from .availability_store import (
+    lock_event,
+    load_free_intervals,
+    store_free_intervals,
+    update_stored_cells,
+    clear_stored_days,
+)
+from .host_helper import (
+    fetch_collective_free_intervals,
+    fetch_round_robin_free_intervals,
+    filter_round_robin_slots,
+    get_hosting_organiser_ids,
+    get_organiser_busy_intervals,
+    lock_host_events,
+)
+
+
+MAX_CHUNK_DAYS = 32
 
 
 def datetime_serializer(obj):
@@ -15,11 +52,180 @@ def datetime_serializer(obj):
     raise TypeError("Type not serializable")
 
 
-def get_available_slots(event_id, start_datetime, end_datetime):
+def lock_booking_events(event):
+    # Hosted events also lock the events that take up their hosts' time
+    if event.has_hosts():
+        lock_host_events(event)
+    else:
+        lock_event(event.id)
+
+
+def is_slot_bookable(event, start_datetime):
+    """
+        Checks a single slot without computing the availability of a range:
+        it has to start on the event's slot grid, after the notice
+        period and within the event's bookable window, and be free for the
+        event's duration. Locks the event rows with lock_booking_events, so
+        it has to run inside the transaction that books the slot.
+    """
+    if start_datetime.second or start_datetime.microsecond:
+        return False
+    start_minutes = to_epoch_minutes(start_datetime)
+    end_minutes = start_minutes + event.duration_in_minutes
+    now = timezone.now()
+    if start_minutes <= to_epoch_minutes(now + timezone.timedelta(minutes=event.notice_in_minutes)):
+        return False
+
+    window_start = to_epoch_minutes(event.start_datetime, round_up=True)
+    window_end = to_epoch_minutes(event.end_datetime)
+    if event.rolling_days:
+        tom = get_start_of_day(now + timezone.timedelta(days=1))
+        window_end = min(window_end, to_epoch_minutes(tom + timezone.timedelta(days=event.rolling_days)))
+    if start_minutes < window_start or end_minutes > window_end:
+        return False
+    if (start_minutes - event.get_slot_grid_origin()) % event.step_in_minutes:
+        return False
+
+    lock_booking_events(event)
+    free_intervals = fetch_free_intervals(event, start_minutes, end_minutes)
+    return bool(
+        len(free_intervals) == 1
+        and free_intervals.starts[0] == start_minutes
+        and free_intervals.ends[0] == end_minutes
+    )
+
+
+def get_seats_left(event, slot_starts):
+    """
+        Returns the seats left in each slot, aligned with the sorted slot
+        start epoch minutes. A seat is taken by every reservation whose
+        buffered range overlaps the slot's buffered range.
+    """
+    slot_starts = np.asarray(slot_starts, dtype=np.int64)
+    if not event.is_group_event() or not len(slot_starts):
+        return np.ones(len(slot_starts), dtype=np.int64)
+
+    booking_gap = event.get_booking_gap_in_minutes()
+    reservations = Reservation.get_active_reservations(
+        event_id=event.id,
+        start_datetime=from_epoch_minutes(slot_starts[0] - booking_gap),
+        end_datetime=from_epoch_minutes(slot_starts[-1] + event.duration_in_minutes + booking_gap)
+    ).values_list("start_datetime", "end_datetime")
+    reservation_starts, reservation_ends = datetime_pairs_to_minutes(reservations)
+    taken_seats = max_overlaps(
+        reservation_starts - booking_gap,
+        reservation_ends + booking_gap,
+        slot_starts,
+        slot_starts + event.duration_in_minutes
+    )
+    return np.maximum(event.capacity - taken_seats, 0)
+
+
+def get_availability_etag(event, query_params, response_format):
+    """
+        Strong ETag of an availability response. Besides the event's data
+        version and the query, slots only depend on the current minute
+        through the notice period and rolling days. None for hosted events,
+        whose slots also change with their hosts' schedules and bookings
+        elsewhere.
+    """
+    if event.has_hosts():
+        return None
+    parts = [
+        event.id,
+        event.availability_version,
+        response_format,
+        to_epoch_minutes(timezone.now()),
+        sorted((key, value) for key in query_params for value in query_params.getlist(key)),
+    ]
+    return quote_etag(hashlib.sha1(repr(parts).encode("utf-8")).hexdigest())
+
+
+def get_available_slot_starts(event, start_datetime, end_datetime, limit=None):
+    """
+        Available slots of an already loaded event in the range, as an int64
+        array of slot start epoch minutes.
+    """
+    if end_datetime <= start_datetime:
+        return np.empty(0, dtype=np.int64)
+    return compute_available_slots(event, start_datetime, end_datetime, limit=limit)
+
+
+def get_available_slot_chunks(event, start_datetime, end_datetime, limit=None):
+    """
+        Streaming form of get_available_slot_starts, returns a generator of
+        slot start arrays.
+    """
+    if end_datetime <= start_datetime:
+        return iter(())
+    return iter_available_slots(event, start_datetime, end_datetime, limit=limit, chunked=True)
+
+
+def get_available_slot_starts_for_events(event_ids, start_datetime, end_datetime):
+    """
+        Batch form of get_available_slot_starts. Events, schedules and the
+        reservations of every uncached event are loaded in a fixed number of
+        queries, whatever the number of events.
+
+        Returns a dict of event id to slot start array for the events that exist.
+    """
+    events = list(
+        Event.objects.filter(pk__in=event_ids).select_related(
+            "schedule"
+        ).prefetch_related(
+            "schedule__weekday_schedules"
+        )
+    )
     if end_datetime <= start_datetime:
-        return []
+        return {event.id: np.empty(0, dtype=np.int64) for event in events}
+
+    window_start, window_end = get_cache_window(
+        to_epoch_minutes(start_datetime),
+        to_epoch_minutes(end_datetime, round_up=True)
+    )
+    free_intervals_by_event = get_free_intervals_for_events(events, window_start, window_end)
+    return {
+        event.id: compute_available_slots(
+            event,
+            start_datetime,
+            end_datetime,
+            free_intervals=free_intervals_by_event[event.id]
+        )
+        for event in events
+    }
+
+
+def compute_available_slots(event, start_datetime, end_datetime, **kwargs):
+    """
+        Returns the start of every available slot of the event in the given
+        range as a sorted int64 array of epoch minutes. Keyword arguments are
+        passed on to iter_available_slots.
+    """
+    slot_chunks = list(iter_available_slots(event, start_datetime, end_datetime, **kwargs))
+    if not slot_chunks:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(slot_chunks)
+
+
+def iter_available_slots(
+    event,
+    start_datetime,
+    end_datetime,
+    limit=None,
+    free_intervals=None,
+    chunked=False
+):
+    """
+        Lazily yields arrays of available slot starts (epoch minutes) in order.
+
+        Unless chunked or limited, the whole range is one chunk, which keeps
+        it on the shared availability cache window. Otherwise the range is
+        walked in chunks that double from a day up to MAX_CHUNK_DAYS, so at
+        most one chunk is held in memory, and with a limit the walk stops as
+        soon as `limit` slots were produced. Slots start on the event's slot
+        grid, so the range only decides which of them are returned.
+    """
     q_s, q_e = start_datetime, end_datetime
-    event = get_object_or_404(Event, pk=event_id)
     slots_start_datetime = timezone.now() + timezone.timedelta(minutes=event.notice_in_minutes)
     start_datetime = max(
         start_datetime,
@@ -30,126 +236,420 @@ def get_available_slots(event_id, start_datetime, end_datetime):
         tom = get_start_of_day(timezone.now() + timezone.timedelta(days=1))
         end_datetime = min(end_datetime, tom + timezone.timedelta(days=event.rolling_days))
 
-    before_buffer = event.before_buffer_time_in_minutes
-    after_buffer = event.after_buffer_time_in_minutes
+    start_minutes = to_epoch_minutes(start_datetime, round_up=True)
+    end_minutes = to_epoch_minutes(end_datetime)
+    if start_minutes >= end_minutes:
+        return
+    # A slot start is a whole minute, so "after the floored notice minute" is
+    # the same as "after the exact notice datetime".
+    slots_start_minutes = max(start_minutes, to_epoch_minutes(slots_start_datetime) + 1)
+
+    if free_intervals is not None:
+        free_interval_chunks = [free_intervals]
+    elif limit is None and not chunked:
+        window_start, window_end = get_cache_window(
+            to_epoch_minutes(q_s),
+            to_epoch_minutes(q_e, round_up=True)
+        )
+        free_interval_chunks = [get_free_intervals(event, window_start, window_end)]
+    else:
+        # Chunks start at a UTC midnight so that repeated queries share cache entries
+        free_interval_chunks = iter_free_intervals(
+            event,
+            start_minutes // MINUTES_IN_DAY * MINUTES_IN_DAY,
+            end_minutes
+        )
+
+    remaining = limit
+    for free_interval_chunk in free_interval_chunks:
+        availabilities = free_interval_chunk.clip(slots_start_minutes, end_minutes)
+        available_slots = availabilities.split_into_slots(
+            event.get_slot_grid_origin(),
+            event.step_in_minutes,
+            event.duration_in_minutes
+        )
+        if event.scheduling_type == SchedulingType.ROUND_ROBIN:
+            available_slots = filter_round_robin_slots(event, available_slots)
+        if remaining is not None:
+            available_slots = available_slots[:remaining]
+            remaining -= len(available_slots)
+        if settings.DEBUG:
+            debug_data = {
+                "q_start": q_s,
+                "q_end": q_e,
+                "start_datetime": start_datetime,
+                "end_datetime": end_datetime,
+                "event.notice_in_minutes": event.notice_in_minutes,
+                "event.rolling_days": event.rolling_days,
+                "availability": availabilities.to_datetime_intervals(),
+                "available_slots": [from_epoch_minutes(slot_start) for slot_start in available_slots],
+            }
+            print(json.dumps(debug_data, default=datetime_serializer, indent=2))
+        if len(available_slots):
+            yield available_slots
+        if remaining == 0:
+            return
+
+
+def iter_free_intervals(event, start_minutes, end_minutes):
+    """
+        Yields the free intervals of [start_minutes, end_minutes) in chunks of
+        doubling size. A free interval that runs into the next chunk is held
+        back and merged with it, so every yielded interval is complete and
+        slots are split exactly as they would be over the whole range.
+    """
+    carry = IntervalSet()
+    chunk_start = start_minutes
+    chunk_minutes = MINUTES_IN_DAY
+    while chunk_start < end_minutes:
+        chunk_end = min(chunk_start + chunk_minutes, end_minutes)
+        free_intervals = carry.union(get_free_intervals(event, chunk_start, chunk_end))
+        carry = IntervalSet()
+        if len(free_intervals) and free_intervals.ends[-1] >= chunk_end:
+            carry = IntervalSet(free_intervals.starts[-1:], free_intervals.ends[-1:])
+            free_intervals = IntervalSet(free_intervals.starts[:-1], free_intervals.ends[:-1])
+        yield free_intervals
+        chunk_start = chunk_end
+        chunk_minutes = min(chunk_minutes * 2, MAX_CHUNK_DAYS * MINUTES_IN_DAY)
+    yield carry
+
+
+def get_next_available_slot_starts(event_id, not_before, limit=1):
+    # Up to `limit` slot start epoch minutes at or after not_before
+    event = get_object_or_404(Event, pk=event_id)
+    return compute_available_slots(event, not_before, event.end_datetime, limit=limit)
+
+
+def get_cache_window(start_minutes, end_minutes):
+    # Rounded to the nearest UTC midnight and padded by a day on both sides so
+    # that the same local dates map to one window for every user timezone.
+    window_start = _nearest_midnight(start_minutes) - MINUTES_IN_DAY
+    window_end = _nearest_midnight(end_minutes) + MINUTES_IN_DAY
+    return window_start, window_end
+
+
+def _nearest_midnight(minutes):
+    return (minutes + MINUTES_IN_DAY // 2) // MINUTES_IN_DAY * MINUTES_IN_DAY
+
+
+def get_free_intervals(event, start_minutes, end_minutes):
+    """
+        Free time of the event (schedule minus buffered reservations) in UTC,
+        cached per event version. Notice, rolling days and the event bounds
+        depend on the current time and are applied by the caller.
+    """
+    if event.has_hosts():
+        # Reservations of the hosts' other events do not bump the version,
+        # so hosted events are neither cached nor stored.
+        return fetch_free_intervals(event, start_minutes, end_minutes)
+    if get_live_hold_event_ids([event], start_minutes, end_minutes):
+        # Holds expire without a write, so the cached and stored free time
+        # leaves them out and time they take up is read fresh.
+        return fetch_free_intervals(event, start_minutes, end_minutes)
+
+    cache_key = _get_cache_key(event, start_minutes, end_minutes)
+    free_intervals = cache.get(cache_key)
+    if free_intervals is None:
+        free_intervals = get_stored_free_intervals(event, start_minutes, end_minutes)
+        cache.set(cache_key, free_intervals, settings.AVAILABILITY_CACHE_TIMEOUT)
+    return free_intervals
+
+
+def get_stored_free_intervals(event, start_minutes, end_minutes):
+    """
+        Reads free intervals from the materialized per-day bitmaps, building
+        the days that are missing first.
+    """
+    free_intervals, missing_days = load_free_intervals(event.id, start_minutes, end_minutes)
+    if not len(missing_days):
+        return free_intervals
+
+    with transaction.atomic():
+        lock_event(event.id)
+        missing_start_minutes = int(missing_days[0]) * MINUTES_IN_DAY
+        missing_end_minutes = (int(missing_days[-1]) + 1) * MINUTES_IN_DAY
+        store_free_intervals(
+            event.id,
+            fetch_free_intervals(event, missing_start_minutes, missing_end_minutes, include_holds=False),
+            missing_days
+        )
+    free_intervals, _ = load_free_intervals(event.id, start_minutes, end_minutes)
+    return free_intervals
+
+
+def mark_reservation_stored_cells(reservation, event, is_reserved):
+    """
+        Flips the stored cells covered by the buffered reservation: to busy
+        when it is reserved, back to whatever the schedule and the remaining
+        reservations allow when it is released or the event takes groups.
+        Hosted events are not stored, but their bookings take up the time of
+        their hosts' own events. Holds are left out of the stored days.
+    """
+    if event.has_hosts():
+        host_ids = [reservation.host_id] if reservation.host_id is not None else get_host_ids(event)
+        invalidate_host_events(host_ids, reservation.start_datetime, reservation.end_datetime)
+        return
+    if reservation.status == ReservationStatus.SOFT_RESERVED:
+        return
+    booking_gap = event.get_booking_gap_in_minutes()
+    start_minutes = to_epoch_minutes(reservation.start_datetime) - booking_gap
+    end_minutes = to_epoch_minutes(reservation.end_datetime, round_up=True) + booking_gap
+    start_minutes -= start_minutes % MINUTES_MULTIPLE_OF
+    end_minutes += -end_minutes % MINUTES_MULTIPLE_OF
+    with transaction.atomic():
+        lock_event(event.id)
+        free_intervals = IntervalSet()
+        # A group slot is only busy once it is full
+        if not is_reserved or event.is_group_event():
+            free_intervals = fetch_free_intervals(event, start_minutes, end_minutes, include_holds=False)
+        update_stored_cells(event.id, start_minutes, end_minutes, free_intervals)
+
+
+def release_expired_holds(batch_size=None, **filters):
+    """
+        Expires one batch of stale soft holds. Holds are left out of the
+        cached and stored free time, so only the versions the ETags are built
+        from are bumped, since the bulk update skips the signals. Returns the
+        number of holds expired.
+    """
+    expired_holds = Reservation.expire_holds(batch_size, **filters)
+    event_ids = {event_id for event_id, _, _ in expired_holds}
+    if event_ids:
+        Event.bump_availability_version(pk__in=event_ids)
+        Event.bump_availability_version(
+            organiser_id__in=EventHost.objects.filter(event_id__in=event_ids).values("user_id"),
+            scheduling_type=SchedulingType.SINGLE_HOST
+        )
+    return len(expired_holds)
+
+
+def confirm_hold(pk, hold_token):
+    """
+        Confirms a live hold, returns the reservation or None when the hold
+        expired or the token does not match. Holds are left out of the stored
+        free time, so the confirmed reservation is marked like a new booking.
+    """
+    with transaction.atomic():
+        if not Reservation.confirm_hold(pk=pk, hold_token=hold_token):
+            return None
+        reservation = Reservation.objects.select_related("event").get(pk=pk)
+        Event.bump_availability_version(pk=reservation.event_id)
+        mark_reservation_stored_cells(reservation, reservation.event, is_reserved=True)
+    return reservation
+
+
+def get_live_hold_event_ids(events, start_minutes, end_minutes):
+    """
+        Ids of the events with a live hold that may take up time in the
+        window, on the event itself or on a hosted event its organiser is a
+        host of. A hold on a hosted event counts for every event of the
+        batch.
+    """
+    padding = 2 * MAX_BUFFER_TIME_IN_MINUTES
+    event_ids = {event.id for event in events}
+    held_event_ids = Reservation.get_live_hold_event_ids(
+        event_ids=event_ids,
+        host_ids={event.organiser_id for event in events},
+        start_datetime=from_epoch_minutes(start_minutes - padding),
+        end_datetime=from_epoch_minutes(end_minutes + padding)
+    )
+    if held_event_ids - event_ids:
+        return event_ids
+    return held_event_ids
+
+
+def get_host_ids(event):
+    return list(event.hosts.values_list("user_id", flat=True))
+
+
+def invalidate_host_events(host_ids, start_datetime=None, end_datetime=None):
+    """
+        The free time of a single host event leaves out the time its
+        organiser spends on the hosted events they are a host of, so
+        bookings of those bump the version of the hosts' own events and
+        clear their stored days around the booking, or all of them when no
+        range is given.
+    """
+    Event.bump_availability_version(organiser_id__in=host_ids, scheduling_type=SchedulingType.SINGLE_HOST)
+    day_filters = {}
+    if start_datetime is not None:
+        # Widened by the buffers of both events
+        padding = timezone.timedelta(minutes=2 * MAX_BUFFER_TIME_IN_MINUTES)
+        day_filters["day__range"] = ((start_datetime - padding).date(), (end_datetime + padding).date())
+    clear_stored_days(
+        event__organiser_id__in=host_ids,
+        event__scheduling_type=SchedulingType.SINGLE_HOST,
+        **day_filters
+    )
+
+
+def fetch_free_intervals(event, start_minutes, end_minutes, include_holds=True):
+    # Hosted events are never cached or stored, so they always count holds
+    if event.scheduling_type == SchedulingType.ROUND_ROBIN:
+        return fetch_round_robin_free_intervals(event, start_minutes, end_minutes)
+    if event.has_hosts():
+        return fetch_collective_free_intervals(event, start_minutes, end_minutes)
+    # Widened by the booking gap, a reservation just outside the window can
+    # still block time inside it.
     reservations = Reservation.get_active_reservations(
-        event_id=event_id,
-        start_datetime=start_datetime,
-        end_datetime=end_datetime
-    ).values("start_datetime", "end_datetime")
-    if before_buffer > 0 or after_buffer > 0:
-        reservations = add_buffer_to_reservations(
-            reservations=reservations,
-            before_buffer_time_in_minutes=before_buffer,
-            after_buffer_time_in_minutes=after_buffer
+        event_id=event.id,
+        start_datetime=from_epoch_minutes(start_minutes - event.get_booking_gap_in_minutes()),
+        end_datetime=from_epoch_minutes(end_minutes + event.get_booking_gap_in_minutes()),
+        include_holds=include_holds
+    ).values_list("start_datetime", "end_datetime")
+    free_intervals = compute_free_intervals(event, reservations, start_minutes, end_minutes)
+    return subtract_organiser_busy_intervals(event, free_intervals, start_minutes, end_minutes, include_holds)
+
+
+def subtract_organiser_busy_intervals(event, free_intervals, start_minutes, end_minutes, include_holds=True):
+    # Bookings of the hosted events the organiser is a host of take up their time too
+    busy_intervals = get_organiser_busy_intervals(event, start_minutes, end_minutes, include_holds)
+    return free_intervals.intersect(busy_intervals.negate(start_minutes, end_minutes))
+
+
+def get_free_intervals_for_events(events, start_minutes, end_minutes):
+    free_intervals_by_event = {
+        event.id: fetch_free_intervals(event, start_minutes, end_minutes)
+        for event in events
+        if event.has_hosts()
+    }
+    events = [event for event in events if not event.has_hosts()]
+    if not events:
+        return free_intervals_by_event
+    # Events with live holds are read fresh and not cached, see get_free_intervals
+    held_event_ids = get_live_hold_event_ids(events, start_minutes, end_minutes)
+    cache_keys = {event.id: _get_cache_key(event, start_minutes, end_minutes) for event in events}
+    cached = cache.get_many(cache_keys.values())
+    free_intervals_by_event.update(
+        (event_id, cached[cache_key])
+        for event_id, cache_key in cache_keys.items()
+        if cache_key in cached and event_id not in held_event_ids
+    )
+    uncached_events = [event for event in events if event.id not in free_intervals_by_event]
+    if not uncached_events:
+        return free_intervals_by_event
+
+    reservations_by_event = {event.id: [] for event in uncached_events}
+    max_booking_gap = max(event.get_booking_gap_in_minutes() for event in uncached_events)
+    reservations = Reservation.get_active_reservations_for_events(
+        event_ids=list(reservations_by_event),
+        start_datetime=from_epoch_minutes(start_minutes - max_booking_gap),
+        end_datetime=from_epoch_minutes(end_minutes + max_booking_gap)
+    ).values_list("event_id", "status", "start_datetime", "end_datetime")
+    for event_id, reservation_status, start_datetime, end_datetime in reservations:
+        if reservation_status == ReservationStatus.SOFT_RESERVED and event_id not in held_event_ids:
+            continue
+        reservations_by_event[event_id].append((start_datetime, end_datetime))
+
+    custom_schedules_by_schedule = {event.schedule_id: [] for event in uncached_events}
+    custom_schedules = CustomDateSchedule.get_overlapping_schedules(
+        schedule_ids=list(custom_schedules_by_schedule),
+        start_datetime=from_epoch_minutes(start_minutes),
+        end_datetime=from_epoch_minutes(end_minutes)
+    ).values_list("schedule_id", "start_datetime", "end_datetime", "start_time", "end_time")
+    for schedule_id, *custom_schedule in custom_schedules:
+        custom_schedules_by_schedule[schedule_id].append(custom_schedule)
+
+    hosting_organiser_ids = get_hosting_organiser_ids(uncached_events)
+    to_cache = {}
+    for event in uncached_events:
+        free_intervals = compute_free_intervals(
+            event,
+            reservations_by_event[event.id],
+            start_minutes,
+            end_minutes,
+            custom_schedules=custom_schedules_by_schedule[event.schedule_id]
         )
+        if event.organiser_id in hosting_organiser_ids:
+            free_intervals = subtract_organiser_busy_intervals(
+                event, free_intervals, start_minutes, end_minutes, include_holds=event.id in held_event_ids
+            )
+        free_intervals_by_event[event.id] = free_intervals
+        if event.id not in held_event_ids:
+            to_cache[cache_keys[event.id]] = free_intervals
+    cache.set_many(to_cache, settings.AVAILABILITY_CACHE_TIMEOUT)
+    return free_intervals_by_event
 
-    reservation_neg = get_negation_interval(
-        reservations,
-        start_datetime,
-        end_datetime
+
+def get_busy_intervals(organiser_id, start_datetime, end_datetime):
+    """
+        Busy time of the organiser across their active events, i.e. their
+        reservations widened by each event's buffers, as sorted disjoint
+        (start_datetime, end_datetime) pairs clipped to the window.
+    """
+    max_buffer = timezone.timedelta(minutes=MAX_BUFFER_TIME_IN_MINUTES)
+    reservations = Reservation.get_active_reservations_for_organiser(
+        organiser_id=organiser_id,
+        start_datetime=start_datetime - max_buffer,
+        end_datetime=end_datetime + max_buffer
+    ).order_by("event_id", "start_datetime").values_list(
+        "event_id",
+        "start_datetime",
+        "end_datetime",
+        "event__before_buffer_time_in_minutes",
+        "event__after_buffer_time_in_minutes",
     )
-    schedules = event.schedule.get_schedule(
-        start_datetime,
-        end_datetime
+
+    # Each event's rows are sorted by start and its buffers are constant,
+    # so every event is one sorted stream to merge.
+    streams = [
+        [
+            (
+                reservation_start - timezone.timedelta(minutes=before_buffer),
+                reservation_end + timezone.timedelta(minutes=after_buffer),
+            )
+            for _, reservation_start, reservation_end, before_buffer, after_buffer in event_reservations
+        ]
+        for _, event_reservations in groupby(reservations, key=itemgetter(0))
+    ]
+    busy_intervals = []
+    for busy_start, busy_end in heapq.merge(*streams):
+        busy_start, busy_end = max(busy_start, start_datetime), min(busy_end, end_datetime)
+        if busy_start >= busy_end:
+            continue
+        if busy_intervals and busy_start <= busy_intervals[-1][1]:
+            busy_intervals[-1][1] = max(busy_intervals[-1][1], busy_end)
+        else:
+            busy_intervals.append([busy_start, busy_end])
+    return [(busy_start, busy_end) for busy_start, busy_end in busy_intervals]
+
+
+def _get_cache_key(event, start_minutes, end_minutes):
+    return "availability:{}:{}:{}:{}".format(
+        event.id, event.availability_version, start_minutes, end_minutes
+    )
+
+
+def compute_free_intervals(event, reservations, start_minutes, end_minutes, custom_schedules=None):
+    """
+        reservations is an iterable of (start_datetime, end_datetime) pairs
+        overlapping the window. custom_schedules are looked up when not given.
+    """
+    # A slot is free when its own buffered range overlaps the buffered
+    # range of fewer reservations than the event's capacity. With a capacity
+    # of one that is any reservation, same as the exclusion constraint.
+    booking_gap = event.get_booking_gap_in_minutes()
+    reservation_starts, reservation_ends = datetime_pairs_to_minutes(reservations)
+    reservations = covered_at_depth(
+        reservation_starts - booking_gap,
+        reservation_ends + booking_gap,
+        event.capacity
     )
 
-    availabilities = find_common_interval(schedules, reservation_neg)
-    available_slots = []
-    for availability in availabilities:
-        available_slots += split_into_slots(
-            start_datetime=availability["start_datetime"],
-            end_datetime=availability["end_datetime"],
-            step_in_minutes=event.step_in_minutes
+    reservation_neg = reservations.negate(start_minutes, end_minutes)
+    schedules = IntervalSet()
+    if event.schedule is not None:
+        schedules = event.schedule.get_schedule_intervals(
+            start_minutes, end_minutes, custom_schedules=custom_schedules
         )
+    free_intervals = schedules.intersect(reservation_neg)
     if settings.DEBUG:
         debug_data = {
-            "q_start": q_s,
-            "q_end": q_e,
-            "start_datetime": start_datetime,
-            "end_datetime": end_datetime,
-            "event.notice_in_minutes": event.notice_in_minutes,
-            "event.rolling_days": event.rolling_days,
             "event.before_buffer_time_in_minutes": event.before_buffer_time_in_minutes,
             "event.after_buffer_time_in_minutes": event.after_buffer_time_in_minutes,
-            "reservations": reservations,
-            "reservation_neg": reservation_neg,
-            "schedules": schedules,
-            "availability": availabilities,
-            "available_slots": available_slots,
+            "reservations": reservations.to_datetime_intervals(),
+            "reservation_neg": reservation_neg.to_datetime_intervals(),
+            "schedules": schedules.to_datetime_intervals(),
         }
         print(json.dumps(debug_data, default=datetime_serializer, indent=2))
-    return list(filter(lambda x: x["start_datetime"] > slots_start_datetime, available_slots))
-
-
-def get_negation_interval(intervals, min_datetime, max_datetime):
-    intervals.sort(key=lambda x: x["start_datetime"])
-    negation = []
-    curr_start = min_datetime
-    for interval in intervals:
-        interval_start = interval["start_datetime"]
-        if curr_start < interval_start:
-            negation.append({
-                "start_datetime": curr_start,
-                "end_datetime": interval_start
-            })
-        curr_start = max(curr_start, interval["end_datetime"])
-    if curr_start < max_datetime:
-        negation.append({
-                "start_datetime": curr_start,
-                "end_datetime": max_datetime
-            })
-    return negation
-
-
-def add_buffer_to_reservations(reservations, before_buffer_time_in_minutes, after_buffer_time_in_minutes):
-    reservations_with_buffer = []
-    for reservation in reservations:
-        reservation["start_datetime"] += timezone.timedelta(minutes=-1*before_buffer_time_in_minutes)
-        reservation["end_datetime"] += timezone.timedelta(minutes=1*after_buffer_time_in_minutes)
-        reservations_with_buffer.append(
-            reservation
-        )
-    return reservations_with_buffer
-
-
-def find_common_interval(interval_a, interval_b):
-    a_n = len(interval_a)
-    b_n = len(interval_b)
-
-    if not a_n or not b_n:
-        return []
-
-    i, j = 0, 0
-    common_intervals = []
-    while i < a_n and j < b_n:
-        start = max(interval_a[i]["start_datetime"], interval_b[j]["start_datetime"])
-        end = min(interval_a[i]["end_datetime"], interval_b[j]["end_datetime"])
-        if start < end:
-            common_intervals.append(
-                {
-                    "start_datetime": start,
-                    "end_datetime": end
-                }
-            )
-        if interval_a[i]["end_datetime"] < interval_b[j]["end_datetime"]:
-            i += 1
-        else:
-            j += 1
-    return merge_datetime_intervals(common_intervals)
-
-
-def split_into_slots(start_datetime, end_datetime, step_in_minutes):
-    slots = []
-    curr_start = start_datetime
-    curr_end = curr_start + timezone.timedelta(minutes=step_in_minutes)
-    while curr_end <= end_datetime:
-        slots.append(
-            {
-                "start_datetime": curr_start,
-                "end_datetime": curr_end,
-            }
-        )
-        curr_start = curr_end
-        curr_end = curr_start + timezone.timedelta(minutes=step_in_minutes)
-    return slots
+    return free_intervals
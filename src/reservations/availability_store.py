@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import models
+
+from events.models import Event
+from commons.constants import MINUTES_MULTIPLE_OF, MINUTES_IN_DAY
+from commons.intervals import IntervalSet, to_epoch_minutes
+from .models import DailyAvailability
+
+
+CELLS_PER_DAY = MINUTES_IN_DAY // MINUTES_MULTIPLE_OF
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def day_to_date(day):
+    return EPOCH_DATE + timedelta(days=int(day))
+
+
+def date_to_day(value):
+    return (value - EPOCH_DATE).days
+
+
+def lock_event(event_id):
+    # Serialises materialization with incremental updates of the same event
+    list(Event.objects.select_for_update().filter(pk=event_id).values_list("pk", flat=True))
+
+
+def cells_to_intervals(cells, origin_minutes):
+    edges = np.diff(np.concatenate(([0], cells.astype(np.int8), [0])))
+    starts = origin_minutes + MINUTES_MULTIPLE_OF * np.flatnonzero(edges == 1)
+    ends = origin_minutes + MINUTES_MULTIPLE_OF * np.flatnonzero(edges == -1)
+    return IntervalSet(starts, ends)
+
+
+def intervals_to_cells(free_intervals, origin_minutes, cell_count):
+    # Only cells that are free for their whole length are marked free
+    start_cells = -(-(free_intervals.starts - origin_minutes) // MINUTES_MULTIPLE_OF)
+    end_cells = (free_intervals.ends - origin_minutes) // MINUTES_MULTIPLE_OF
+    start_cells = np.clip(start_cells, 0, cell_count)
+    end_cells = np.clip(end_cells, 0, cell_count)
+    deltas = np.zeros(cell_count + 1, dtype=np.int64)
+    np.add.at(deltas, start_cells, 1)
+    np.add.at(deltas, end_cells, -1)
+    return np.cumsum(deltas[:-1]) > 0
+
+
+def _unpack(free_cells):
+    return np.unpackbits(np.frombuffer(free_cells, dtype=np.uint8))[:CELLS_PER_DAY].astype(bool)
+
+
+def _pack(cells):
+    return np.packbits(cells).tobytes()
+
+
+def load_free_intervals(event_id, start_minutes, end_minutes):
+    """
+        Returns the stored free intervals of the window and the days (as day
+        numbers since the epoch) that are not materialized yet.
+    """
+    first_day = start_minutes // MINUTES_IN_DAY
+    last_day = (end_minutes - 1) // MINUTES_IN_DAY
+    day_count = last_day - first_day + 1
+    cells = np.zeros((day_count, CELLS_PER_DAY), dtype=bool)
+    is_stored = np.zeros(day_count, dtype=bool)
+    rows = DailyAvailability.objects.filter(
+        event_id=event_id,
+        day__range=(day_to_date(first_day), day_to_date(last_day))
+    ).values_list("day", "free_cells")
+    for day, free_cells in rows:
+        idx = date_to_day(day) - first_day
+        cells[idx] = _unpack(free_cells)
+        is_stored[idx] = True
+    free_intervals = cells_to_intervals(cells.ravel(), first_day * MINUTES_IN_DAY)
+    missing_days = first_day + np.flatnonzero(~is_stored)
+    return free_intervals.clip(start_minutes, end_minutes), missing_days
+
+
+def store_free_intervals(event_id, free_intervals, days):
+    """
+        Materializes the given days from free intervals covering all of them.
+    """
+    first_day = int(days[0])
+    day_count = int(days[-1]) - first_day + 1
+    cells = intervals_to_cells(
+        free_intervals,
+        first_day * MINUTES_IN_DAY,
+        day_count * CELLS_PER_DAY
+    ).reshape(day_count, CELLS_PER_DAY)
+    DailyAvailability.objects.bulk_create(
+        [
+            DailyAvailability(
+                event_id=event_id,
+                day=day_to_date(day),
+                free_cells=_pack(cells[day - first_day])
+            )
+            for day in days
+        ],
+        ignore_conflicts=True
+    )
+
+
+def update_stored_cells(event_id, start_minutes, end_minutes, free_intervals):
+    """
+        Rewrites only the cells touching [start_minutes, end_minutes) of the
+        materialized days, from free intervals covering that range. Days that
+        are not materialized are left alone, they are built on first read.
+    """
+    first_day = start_minutes // MINUTES_IN_DAY
+    last_day = (end_minutes - 1) // MINUTES_IN_DAY
+    rows = list(
+        DailyAvailability.objects.select_for_update().filter(
+            event_id=event_id,
+            day__range=(day_to_date(first_day), day_to_date(last_day))
+        )
+    )
+    for row in rows:
+        origin_minutes = date_to_day(row.day) * MINUTES_IN_DAY
+        start_cell = max((start_minutes - origin_minutes) // MINUTES_MULTIPLE_OF, 0)
+        end_cell = min(-(-(end_minutes - origin_minutes) // MINUTES_MULTIPLE_OF), CELLS_PER_DAY)
+        cells = _unpack(row.free_cells)
+        cells[start_cell:end_cell] = intervals_to_cells(
+            free_intervals, origin_minutes, CELLS_PER_DAY
+        )[start_cell:end_cell]
+        row.free_cells = _pack(cells)
+    DailyAvailability.objects.bulk_update(rows, ["free_cells"])
+
+
+def clear_stored_days(*args, **filters):
+    DailyAvailability.objects.filter(*args, **filters).delete()
+
+
+def get_changed_days_filter(changed_weekdays, changed_ranges):
+    """
+        Q matching the stored days of the given UTC days of week (Monday is 0)
+        and of the days overlapping the (start, end) datetime ranges.
+    """
+    days_filter = models.Q(day__iso_week_day__in=[weekday + 1 for weekday in changed_weekdays])
+    for start_datetime, end_datetime in changed_ranges:
+        days_filter |= models.Q(
+            day__gte=day_to_date(to_epoch_minutes(start_datetime) // MINUTES_IN_DAY),
+            day__lte=day_to_date((to_epoch_minutes(end_datetime, round_up=True) - 1) // MINUTES_IN_DAY)
+        )
+    return days_filter
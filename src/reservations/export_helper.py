@@ -0,0 +1,176 @@
+import csv
+import datetime
+import heapq
+import io
+from itertools import islice
+
+from commons.enums import ReservationStatus
+from .models import Reservation, ArchivedReservation
+
+
+# Rows fetched per round-trip, and written per chunk of the response
+EXPORT_CHUNK_SIZE = 2000
+CSV_COLUMNS = (
+    "id",
+    "status",
+    "start_datetime",
+    "end_datetime",
+    "attendee_full_name",
+    "attendee_email",
+    "is_active",
+    "created_at",
+)
+ICS_COLUMNS = ("id", "status", "start_datetime", "end_datetime", "attendee_full_name", "attendee_email", "updated_at")
+ICS_STATUSES = {
+    ReservationStatus.SOFT_RESERVED: "TENTATIVE",
+    ReservationStatus.RESERVED: "CONFIRMED",
+    ReservationStatus.CANCELLED: "CANCELLED",
+}
+# Spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Octets per iCalendar content line, longer lines are folded
+ICS_LINE_LENGTH = 75
+
+
+def iter_reservation_chunks(columns, **filters):
+    """
+        Yields chunks of every reservation of the filter as tuples of the
+        columns, by start. Archived reservations are merged in, so that the
+        export still covers past bookings once they are archived.
+    """
+    start_index = columns.index("start_datetime")
+    rows = heapq.merge(
+        iter_rows(ArchivedReservation.objects.filter(**filters), columns),
+        iter_rows(Reservation.objects.filter(**filters), columns),
+        key=lambda row: (row[start_index], row[0])
+    )
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_rows(queryset, columns):
+    # values_list keeps rows as tuples and iterator() reads them with a
+    # server-side cursor, so memory stays flat however many rows there are.
+    return queryset.order_by("start_datetime", "id").values_list(*columns).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+
+
+def iter_csv_export(event_id):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for chunk in iter_reservation_chunks(CSV_COLUMNS, event_id=event_id):
+        writer.writerows(
+            (
+                reservation_id,
+                status,
+                start_datetime.isoformat(),
+                end_datetime.isoformat(),
+                escape_csv_cell(attendee_full_name),
+                escape_csv_cell(attendee_email),
+                is_active,
+                created_at.isoformat(),
+            )
+            for (
+                reservation_id,
+                status,
+                start_datetime,
+                end_datetime,
+                attendee_full_name,
+                attendee_email,
+                is_active,
+                created_at,
+            ) in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header of an event without reservations
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ics_export(event):
+    yield to_ics_lines([
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//eventchimp//reservations//EN",
+        "CALSCALE:GREGORIAN",
+    ])
+    summary = escape_ics_text(event.title)
+    for chunk in iter_reservation_chunks(ICS_COLUMNS, event_id=event.id, is_active=True):
+        lines = []
+        for (
+            reservation_id,
+            status,
+            start_datetime,
+            end_datetime,
+            attendee_full_name,
+            attendee_email,
+            updated_at,
+        ) in chunk:
+            lines += [
+                "BEGIN:VEVENT",
+                "UID:reservation-{}@eventchimp".format(reservation_id),
+                "DTSTAMP:{}".format(format_ics_datetime(updated_at)),
+                "DTSTART:{}".format(format_ics_datetime(start_datetime)),
+                "DTEND:{}".format(format_ics_datetime(end_datetime)),
+                "SUMMARY:{}".format(summary),
+                "STATUS:{}".format(ICS_STATUSES[status]),
+                'ATTENDEE;CN="{}":mailto:{}'.format(escape_ics_param(attendee_full_name), attendee_email),
+                "END:VEVENT",
+            ]
+        yield to_ics_lines(lines)
+    yield to_ics_lines(["END:VCALENDAR"])
+
+
+def escape_csv_cell(value):
+    if value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def format_ics_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def escape_ics_text(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def escape_ics_param(value):
+    # Quoted parameter values can not hold quotes or line breaks
+    return value.replace('"', "'").replace("\r", " ").replace("\n", " ")
+
+
+def to_ics_lines(lines):
+    return "".join(fold_ics_line(line) + "\r\n" for line in lines)
+
+
+def fold_ics_line(line):
+    encoded = line.encode("utf-8")
+    if len(encoded) <= ICS_LINE_LENGTH:
+        return line
+    parts = []
+    start = 0
+    # Continuation lines start with a space, which counts towards their length
+    limit = ICS_LINE_LENGTH
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start = end
+        limit = ICS_LINE_LENGTH - 1
+    return "\r\n ".join(parts)
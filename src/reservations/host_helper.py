@@ -0,0 +1,214 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Q
+
+from events.models import Event, EventHost
+from schedules.models import CustomDateSchedule
+from commons.constants import MAX_BUFFER_TIME_IN_MINUTES
+from commons.intervals import IntervalSet, intersect_all, union_all, to_epoch_minutes, from_epoch_minutes
+from .models import Reservation
+
+
+def get_hosts(event):
+    # Weekday rows are prefetched for the compiled schedules
+    return list(event.hosts.select_related("schedule").prefetch_related("schedule__weekday_schedules"))
+
+
+def get_host_schedule_intervals(hosts, start_minutes, end_minutes):
+    """
+        Returns {host user id: IntervalSet} of the hosts' own schedules over
+        the window, custom dates of all of them read in one query.
+    """
+    schedule_ids = [host.schedule_id for host in hosts if host.schedule_id is not None]
+    custom_schedules_by_schedule = defaultdict(list)
+    custom_schedules = CustomDateSchedule.get_overlapping_schedules(
+        schedule_ids=schedule_ids,
+        start_datetime=from_epoch_minutes(start_minutes),
+        end_datetime=from_epoch_minutes(end_minutes)
+    ).values_list("schedule_id", "start_datetime", "end_datetime", "start_time", "end_time")
+    for schedule_id, *custom_schedule in custom_schedules:
+        custom_schedules_by_schedule[schedule_id].append(custom_schedule)
+
+    return {
+        host.user_id: (
+            host.schedule.get_schedule_intervals(
+                start_minutes, end_minutes, custom_schedules=custom_schedules_by_schedule[host.schedule_id]
+            )
+            if host.schedule is not None else IntervalSet()
+        )
+        for host in hosts
+    }
+
+
+def get_host_event_ids(host_ids):
+    # Events whose reservations take up the hosts' time
+    return list(
+        Event.objects.filter(
+            Q(organiser_id__in=host_ids) | Q(hosts__user_id__in=host_ids),
+            is_active=True
+        ).order_by("id").values_list("id", flat=True).distinct()
+    )
+
+
+def lock_host_events(event):
+    """
+        Locks the event along with every event of its hosts in a single
+        query in id order, so that bookings locking overlapping sets take
+        the shared rows in the same order and can not deadlock.
+    """
+    host_ids = list(event.hosts.values_list("user_id", flat=True))
+    list(
+        Event.objects.select_for_update().filter(pk__in=[event.id, *get_host_event_ids(host_ids)])
+        .order_by("id").values_list("pk", flat=True)
+    )
+
+
+def get_host_busy_intervals(event, host_ids, start_minutes, end_minutes, hosted_only=False, include_holds=True):
+    """
+        Returns {host user id: IntervalSet} of the time each host can not
+        take a slot of the event: the reservations of every event they
+        organise or host, or only host when hosted_only, widened so that the
+        slot's buffered range does not overlap the reservation's buffered
+        range. A round robin reservation only takes up the time of the host
+        it was assigned to.
+    """
+    hosts_by_event_id = defaultdict(set)
+    buffers_by_event_id = {}
+    host_filter = Q(hosts__user_id__in=host_ids)
+    if not hosted_only:
+        host_filter |= Q(organiser_id__in=host_ids)
+    host_events = Event.objects.filter(host_filter, is_active=True).values_list(
+        "id",
+        "organiser_id",
+        "hosts__user_id",
+        "before_buffer_time_in_minutes",
+        "after_buffer_time_in_minutes",
+    )
+    for event_id, organiser_id, host_user_id, before_buffer, after_buffer in host_events:
+        hosts_by_event_id[event_id].update(
+            host_id for host_id in (organiser_id, host_user_id) if host_id in host_ids
+        )
+        buffers_by_event_id[event_id] = (before_buffer, after_buffer)
+
+    padding = 2 * MAX_BUFFER_TIME_IN_MINUTES
+    reservations = Reservation.get_active_reservations_for_events(
+        event_ids=list(hosts_by_event_id),
+        start_datetime=from_epoch_minutes(start_minutes - padding),
+        end_datetime=from_epoch_minutes(end_minutes + padding),
+        include_holds=include_holds
+    ).values_list("event_id", "host_id", "start_datetime", "end_datetime")
+
+    starts_by_host, ends_by_host = defaultdict(list), defaultdict(list)
+    for event_id, reservation_host_id, start_datetime, end_datetime in reservations:
+        before_buffer, after_buffer = buffers_by_event_id[event_id]
+        busy_start = to_epoch_minutes(start_datetime) - before_buffer - event.after_buffer_time_in_minutes
+        busy_end = to_epoch_minutes(end_datetime, round_up=True) + after_buffer + event.before_buffer_time_in_minutes
+        busy_host_ids = hosts_by_event_id[event_id]
+        if reservation_host_id is not None:
+            busy_host_ids = busy_host_ids & {reservation_host_id}
+        for host_id in busy_host_ids:
+            starts_by_host[host_id].append(busy_start)
+            ends_by_host[host_id].append(busy_end)
+
+    return {
+        host_id: IntervalSet.from_intervals(
+            np.asarray(starts_by_host[host_id], dtype=np.int64),
+            np.asarray(ends_by_host[host_id], dtype=np.int64)
+        )
+        for host_id in host_ids
+    }
+
+
+def get_organiser_busy_intervals(event, start_minutes, end_minutes, include_holds=True):
+    """
+        Time the organiser of a single host event is taken by the collective
+        and round robin events they are a host of.
+    """
+    return get_host_busy_intervals(
+        event, {event.organiser_id}, start_minutes, end_minutes, hosted_only=True, include_holds=include_holds
+    )[event.organiser_id]
+
+
+def get_hosting_organiser_ids(events):
+    # Organisers of the events that are also hosts of an active event
+    return set(
+        EventHost.objects.filter(
+            user_id__in={event.organiser_id for event in events},
+            event__is_active=True
+        ).values_list("user_id", flat=True)
+    )
+
+
+def fetch_collective_free_intervals(event, start_minutes, end_minutes):
+    """
+        Free time of a collective event: every host's schedule and every
+        host's free time intersected in one sweep.
+    """
+    hosts = get_hosts(event)
+    if not hosts:
+        return IntervalSet()
+    host_ids = {host.user_id for host in hosts}
+    schedule_intervals = get_host_schedule_intervals(hosts, start_minutes, end_minutes)
+    busy_intervals = get_host_busy_intervals(event, host_ids, start_minutes, end_minutes)
+    return intersect_all([
+        *schedule_intervals.values(),
+        *(host_busy.negate(start_minutes, end_minutes) for host_busy in busy_intervals.values()),
+    ])
+
+
+def get_host_free_intervals(event, hosts, start_minutes, end_minutes):
+    # {host user id: IntervalSet} of each host's own free time
+    host_ids = {host.user_id for host in hosts}
+    schedule_intervals = get_host_schedule_intervals(hosts, start_minutes, end_minutes)
+    busy_intervals = get_host_busy_intervals(event, host_ids, start_minutes, end_minutes)
+    return {
+        host_id: schedule_intervals[host_id].intersect(
+            busy_intervals[host_id].negate(start_minutes, end_minutes)
+        )
+        for host_id in host_ids
+    }
+
+
+def fetch_round_robin_free_intervals(event, start_minutes, end_minutes):
+    # Free time of a round robin event: the union of the hosts' free time
+    hosts = get_hosts(event)
+    if not hosts:
+        return IntervalSet()
+    return union_all(list(get_host_free_intervals(event, hosts, start_minutes, end_minutes).values()))
+
+
+def filter_round_robin_slots(event, slot_starts):
+    """
+        Keeps the slots that a single host is free for over the whole
+        duration. A slot can fit the union of the hosts' free time across
+        the seam between two hosts without fitting either of them.
+    """
+    if not len(slot_starts):
+        return slot_starts
+    slot_ends = slot_starts + event.duration_in_minutes
+    host_free_intervals = get_host_free_intervals(event, get_hosts(event), int(slot_starts[0]), int(slot_ends[-1]))
+    is_taken = np.zeros(len(slot_starts), dtype=bool)
+    for host_free in host_free_intervals.values():
+        is_taken |= host_free.covers(slot_starts, slot_ends)
+    return slot_starts[is_taken]
+
+
+def get_free_host_ids(event, start_minutes, end_minutes):
+    # Hosts free for the whole of [start_minutes, end_minutes)
+    host_free_intervals = get_host_free_intervals(event, get_hosts(event), start_minutes, end_minutes)
+    return [
+        host_id
+        for host_id, host_free in host_free_intervals.items()
+        if host_free.covers([start_minutes], [end_minutes])[0]
+    ]
+
+
+def assign_round_robin_host(event, start_minutes):
+    """
+        Returns the user id of the least loaded host free for the slot, None
+        when every host is taken. Has to run after is_slot_bookable locked
+        the hosts' events.
+    """
+    free_host_ids = get_free_host_ids(event, start_minutes, start_minutes + event.duration_in_minutes)
+    return EventHost.assign_least_loaded(event.id, free_host_ids)
@@ -0,0 +1,228 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from events.models import Event, EventHost
+from commons.enums import ReservationStatus, SchedulingType
+from commons.constants import MINUTES_IN_DAY
+from commons.exceptions import is_constraint_violation
+from commons.intervals import (
+    IntervalSet,
+    count_overlaps,
+    datetime_pairs_to_minutes,
+    to_epoch_minutes,
+    from_epoch_minutes,
+)
+from .models import Reservation, BLOCKED_RANGE_CONSTRAINT, HOST_BLOCKED_RANGE_CONSTRAINT
+from .serializers import ReservationImportRowSerializer
+from .availability_helper import (
+    fetch_free_intervals,
+    get_host_ids,
+    invalidate_host_events,
+    lock_booking_events,
+    release_expired_holds,
+)
+from .availability_store import clear_stored_days, day_to_date
+from .host_helper import get_hosts, get_host_free_intervals
+
+
+IMPORT_BATCH_SIZE = 500
+
+
+def import_reservations(rows, organiser_id):
+    """
+        Creates existing bookings in bulk. Each event's rows are checked
+        against its free time, computed once, and against each other, so
+        only the rows that fail are rejected.
+
+        Returns the number of reservations created and the errors of the
+        rejected rows by their index in `rows`.
+    """
+    errors = {}
+    rows_by_event_id = defaultdict(list)
+    for index, row in enumerate(rows):
+        row_serializer = ReservationImportRowSerializer(data=row)
+        if row_serializer.is_valid():
+            rows_by_event_id[row_serializer.validated_data["event"]].append((index, row_serializer.validated_data))
+        else:
+            errors[index] = row_serializer.errors
+
+    events = Event.objects.filter(organiser_id=organiser_id).in_bulk(list(rows_by_event_id))
+    created_count = 0
+    for event_id, event_rows in rows_by_event_id.items():
+        if event_id not in events:
+            for index, _ in event_rows:
+                errors[index] = {"event": [f"Event {event_id} does not exist"]}
+            continue
+        created_count += import_event_reservations(events[event_id], event_rows, errors)
+
+    return created_count, [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+
+
+def import_event_reservations(event, event_rows, errors):
+    starts = np.array([to_epoch_minutes(row["start_datetime"]) for _, row in event_rows], dtype=np.int64)
+    ends = starts + event.duration_in_minutes
+    booking_gap = event.get_booking_gap_in_minutes()
+    is_round_robin = event.scheduling_type == SchedulingType.ROUND_ROBIN
+    with transaction.atomic():
+        lock_booking_events(event)
+        # Stale holds count for the constraint until they are expired
+        release_expired_holds(event_id=event.id)
+        free_intervals = fetch_free_intervals(event, int(starts.min()), int(ends.max()))
+        is_free = free_intervals.covers(starts, ends)
+        is_free &= starts >= to_epoch_minutes(event.start_datetime, round_up=True)
+        is_free &= ends <= to_epoch_minutes(event.end_datetime)
+
+        if event.is_group_event():
+            seat_points, taken_seats = get_taken_seats(event, starts, ends)
+        if is_round_robin:
+            host_free_intervals = get_host_free_intervals(
+                event, get_hosts(event), int(starts.min()), int(ends.max())
+            )
+
+        # Sweep in start order. A row conflicts with the previous row that
+        # was kept when their buffered ranges overlap, or for group events
+        # when the existing and kept rows already fill a seat of its slot.
+        # Round robin rows only conflict through the host they are given.
+        reservations, reservation_indexes = [], []
+        last_end, last_index = None, None
+        for position in np.argsort(starts, kind="stable"):
+            index, row = event_rows[position]
+            host_id = None
+            if not is_free[position]:
+                errors[index] = {"start_datetime": ["Requested slot is not available"]}
+                continue
+            if event.is_group_event():
+                first_segment, last_segment = np.searchsorted(seat_points, [starts[position], ends[position]])
+                if taken_seats[first_segment:last_segment].max() >= event.capacity:
+                    errors[index] = {"start_datetime": ["Requested slot is full"]}
+                    continue
+                first_segment, last_segment = np.searchsorted(
+                    seat_points,
+                    [starts[position] - booking_gap, ends[position] + booking_gap]
+                )
+                taken_seats[first_segment:last_segment] += 1
+            elif is_round_robin:
+                host_id = assign_import_host(event, host_free_intervals, starts[position], ends[position])
+                if host_id is None:
+                    errors[index] = {"start_datetime": ["Requested slot is not available"]}
+                    continue
+            elif last_end is not None and starts[position] < last_end + booking_gap:
+                errors[index] = {"start_datetime": [f"Overlaps the reservation at index {last_index}"]}
+                continue
+            last_end, last_index = ends[position], index
+            reservation = Reservation(
+                event=event,
+                status=ReservationStatus.RESERVED,
+                start_datetime=row["start_datetime"],
+                end_datetime=row["start_datetime"] + timezone.timedelta(minutes=event.duration_in_minutes),
+                attendee_full_name=row["attendee_full_name"],
+                attendee_email=row["attendee_email"],
+                host_id=host_id,
+            )
+            # bulk_create skips save(), and with it the post_save receivers
+            reservation.blocked_range = reservation.get_blocked_range(event)
+            reservations.append(reservation)
+            reservation_indexes.append(index)
+
+        reservations = create_reservations(event, reservations, reservation_indexes, errors)
+        if reservations:
+            Event.bump_availability_version(pk=event.id)
+            clear_stored_days(
+                event_id=event.id,
+                day__range=(
+                    day_to_date((starts.min() - booking_gap) // MINUTES_IN_DAY),
+                    day_to_date((ends.max() + booking_gap) // MINUTES_IN_DAY),
+                )
+            )
+            if event.has_hosts():
+                invalidate_host_events(
+                    get_host_ids(event),
+                    from_epoch_minutes(starts.min()),
+                    from_epoch_minutes(ends.max())
+                )
+    return len(reservations)
+
+
+def create_reservations(event, reservations, reservation_indexes, errors):
+    """
+        Inserts the checked rows in bulk. Rows the checks could not see,
+        like bookings made elsewhere on the hosts' time, still trip the
+        exclusion constraints. The rows are then inserted one by one so
+        that only the conflicting ones are rejected. Returns the
+        reservations created.
+    """
+    try:
+        with transaction.atomic():
+            return Reservation.objects.bulk_create(reservations, batch_size=IMPORT_BATCH_SIZE)
+    except IntegrityError as ex:
+        if not is_blocked_range_violation(ex):
+            raise
+
+    created = []
+    for index, reservation in zip(reservation_indexes, reservations):
+        try:
+            with transaction.atomic():
+                Reservation.objects.bulk_create([reservation])
+        except IntegrityError as ex:
+            if not is_blocked_range_violation(ex):
+                raise
+            errors[index] = {"start_datetime": ["Requested slot is not available"]}
+            if reservation.host_id is not None:
+                EventHost.release_bookings(event.id, reservation.host_id)
+            continue
+        created.append(reservation)
+    return created
+
+
+def is_blocked_range_violation(error):
+    return (
+        is_constraint_violation(error, BLOCKED_RANGE_CONSTRAINT)
+        or is_constraint_violation(error, HOST_BLOCKED_RANGE_CONSTRAINT)
+    )
+
+
+def assign_import_host(event, host_free_intervals, start_minutes, end_minutes):
+    """
+        Gives the row to the least loaded host free for it, the same way
+        bookings are assigned, and takes the row's buffered range out of
+        that host's free time. Returns the host's user id, None when every
+        host is taken.
+    """
+    free_host_ids = [
+        host_id
+        for host_id, host_free in host_free_intervals.items()
+        if host_free.covers([start_minutes], [end_minutes])[0]
+    ]
+    host_id = EventHost.assign_least_loaded(event.id, free_host_ids)
+    if host_id is not None:
+        booking_gap = event.get_booking_gap_in_minutes()
+        host_free = host_free_intervals[host_id]
+        taken = IntervalSet([start_minutes - booking_gap], [end_minutes + booking_gap])
+        host_free_intervals[host_id] = host_free.intersect(
+            taken.negate(int(host_free.starts[0]), int(host_free.ends[-1]))
+        )
+    return host_id
+
+
+def get_taken_seats(event, starts, ends):
+    """
+        Splits time at the rows' slot and buffered range boundaries. Returns
+        the boundaries and the seats the existing reservations take on each
+        segment between them, counted with the sweep that builds free time.
+    """
+    booking_gap = event.get_booking_gap_in_minutes()
+    reservations = Reservation.get_active_reservations(
+        event_id=event.id,
+        start_datetime=from_epoch_minutes(int(starts.min()) - 2 * booking_gap),
+        end_datetime=from_epoch_minutes(int(ends.max()) + 2 * booking_gap)
+    ).values_list("start_datetime", "end_datetime")
+    reservation_starts, reservation_ends = datetime_pairs_to_minutes(reservations)
+    points, depth = count_overlaps(reservation_starts - booking_gap, reservation_ends + booking_gap)
+    seat_points = np.unique(np.concatenate((starts, ends, starts - booking_gap, ends + booking_gap)))
+    # The last boundary at or before a point carries the depth after it
+    idx = np.searchsorted(points, seat_points, side="right") - 1
+    taken_seats = np.where(idx >= 0, depth[np.maximum(idx, 0)] if len(depth) else 0, 0)
+    return seat_points, taken_seats
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from reservations.archive_helper import archive_reservations, get_archive_cutoff, prune_stored_days
+
+
+class Command(BaseCommand):
+    help = "Moves reservations over before a past month to the archive, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=1,
+            help="Number of past months kept in the reservations table"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = get_archive_cutoff(options["months"])
+        archived_count = 0
+        while True:
+            batch_count = archive_reservations(cutoff, batch_size)
+            archived_count += batch_count
+            if batch_count < batch_size:
+                break
+        pruned_count = prune_stored_days(cutoff)
+        self.stdout.write(
+            f"Archived {archived_count} reservations and pruned {pruned_count} stored days before {cutoff.date()}"
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservations.availability_helper import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Cancels soft holds past their expiry, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        expired_count = 0
+        while True:
+            with transaction.atomic():
+                batch_count = release_expired_holds(batch_size=batch_size)
+            expired_count += batch_count
+            if batch_count < batch_size:
+                break
+        self.stdout.write(f"Expired {expired_count} holds")
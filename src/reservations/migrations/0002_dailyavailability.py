@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 17:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_availability_version'),
+        ('reservations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='events.event'),
+        ),
+        migrations.CreateModel(
+            name='DailyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('free_cells', models.BinaryField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_availabilities', to='events.event')),
+            ],
+            options={
+                'unique_together': {('event', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2 on 2026-10-17 17:53
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
+
+
+BACKFILL_BATCH_SIZE = 1000
+MAX_REPORTED_CONFLICTS = 100
+
+
+def set_blocked_ranges(apps, schema_editor):
+    """
+        Backfills blocked_range in chunks and checks that no two active
+        reservations of an event overlap on it, as the constraint requires.
+        Bookings are never changed here: Postgres can not add an exclusion
+        constraint NOT VALID, so the migration fails listing the conflicting
+        reservations for the organisers to cancel or move before running it
+        again.
+    """
+    Reservation = apps.get_model("reservations", "Reservation")
+    reservations = Reservation.objects.select_related("event").order_by("event_id", "start_datetime", "id")
+    batch = []
+    conflicts = []
+    # Latest blocked end among the event's active reservations so far
+    last_event_id, max_blocked_end, max_blocked_end_id = None, None, None
+    for reservation in reservations.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        event = reservation.event
+        reservation.blocked_range = DateTimeTZRange(
+            reservation.start_datetime - timezone.timedelta(minutes=event.before_buffer_time_in_minutes),
+            reservation.end_datetime + timezone.timedelta(minutes=event.after_buffer_time_in_minutes),
+            bounds="[)"
+        )
+        if reservation.is_active and reservation.status != "CANCELLED":
+            if reservation.event_id != last_event_id:
+                last_event_id, max_blocked_end, max_blocked_end_id = reservation.event_id, None, None
+            if max_blocked_end is not None and reservation.blocked_range.lower < max_blocked_end:
+                conflicts.append((reservation.event_id, max_blocked_end_id, reservation.id))
+            if max_blocked_end is None or reservation.blocked_range.upper > max_blocked_end:
+                max_blocked_end, max_blocked_end_id = reservation.blocked_range.upper, reservation.id
+        batch.append(reservation)
+        if len(batch) == BACKFILL_BATCH_SIZE:
+            Reservation.objects.bulk_update(batch, ["blocked_range"])
+            batch = []
+    if batch:
+        Reservation.objects.bulk_update(batch, ["blocked_range"])
+
+    if conflicts:
+        raise RuntimeError(
+            "{} active reservations overlap an earlier one of their event once widened by the event's "
+            "buffers. Cancel or move them and run the migration again. "
+            "(event id, earlier reservation id, reservation id): {}{}".format(
+                len(conflicts),
+                ", ".join(str(conflict) for conflict in conflicts[:MAX_REPORTED_CONFLICTS]),
+                ", ..." if len(conflicts) > MAX_REPORTED_CONFLICTS else ""
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_dailyavailability'),
+    ]
+
+    operations = [
+        # Lets the GiST exclusion constraint compare event ids
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='reservation',
+            name='blocked_range',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(set_blocked_ranges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('is_active', True), models.Q(('status', 'CANCELLED'), _negated=True)), expressions=[('event', '='), ('blocked_range', '&&')], name='reservation_blocked_range_excl'),
+        ),
+    ]
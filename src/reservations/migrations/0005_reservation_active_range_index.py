@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_reservation_soft_holds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True), ('status__in', ['SOFT_RESERVED', 'RESERVED'])), fields=['event', 'end_datetime', 'start_datetime'], name='reservation_active_range_idx'),
+        ),
+    ]
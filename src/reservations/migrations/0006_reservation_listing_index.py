@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0005_reservation_active_range_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['event', 'start_datetime', 'id'], name='reservation_listing_idx'),
+        ),
+    ]
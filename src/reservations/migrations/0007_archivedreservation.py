@@ -0,0 +1,100 @@
+# Generated by Django 4.2 on 2026-10-17 18:05
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+ARCHIVE_TABLE = "reservations_archivedreservation"
+
+
+def get_month_start(value):
+    return value.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def create_archive_table(apps, schema_editor):
+    ArchivedReservation = apps.get_model("reservations", "ArchivedReservation")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(ArchivedReservation)
+        return
+
+    # Partitioned tables need the partition key in their primary key
+    schema_editor.execute(
+        """
+        CREATE TABLE {table} (
+            "id" bigint NOT NULL,
+            "event_id" bigint NOT NULL REFERENCES "events_event" ("id") DEFERRABLE INITIALLY DEFERRED,
+            "status" varchar NOT NULL,
+            "start_datetime" timestamp with time zone NOT NULL,
+            "end_datetime" timestamp with time zone NOT NULL,
+            "attendee_full_name" varchar(255) NOT NULL,
+            "attendee_email" varchar(254) NOT NULL,
+            "is_active" boolean NOT NULL,
+            "created_at" timestamp with time zone NOT NULL,
+            "updated_at" timestamp with time zone NOT NULL,
+            "archived_at" timestamp with time zone NOT NULL,
+            PRIMARY KEY ("id", "start_datetime")
+        ) PARTITION BY RANGE ("start_datetime")
+        """.format(table=schema_editor.quote_name(ARCHIVE_TABLE))
+    )
+
+    # Partitions for every month of the existing reservations up to the
+    # current one, later months are created by archive_reservations.
+    Reservation = apps.get_model("reservations", "Reservation")
+    first_start = Reservation.objects.aggregate(first_start=models.Min("start_datetime"))["first_start"]
+    month_start = get_month_start(first_start or timezone.now())
+    last_month_start = get_month_start(timezone.now())
+    while month_start <= last_month_start:
+        next_month_start = (month_start + datetime.timedelta(days=32)).replace(day=1)
+        schema_editor.execute(
+            "CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)".format(
+                schema_editor.quote_name("{}_y{:04d}m{:02d}".format(ARCHIVE_TABLE, month_start.year, month_start.month)),
+                schema_editor.quote_name(ARCHIVE_TABLE),
+            ),
+            params=[month_start, next_month_start]
+        )
+        month_start = next_month_start
+
+
+def drop_archive_table(apps, schema_editor):
+    # Drops the partitions along with a partitioned table
+    schema_editor.delete_model(apps.get_model("reservations", "ArchivedReservation"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_event_listing_index'),
+        ('reservations', '0006_reservation_listing_index'),
+    ]
+
+    operations = [
+        # The table is created by create_archive_table, partitioned on Postgres
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedReservation',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('status', models.CharField(choices=[('SOFT_RESERVED', 'Soft Reserved'), ('RESERVED', 'Reserved'), ('CANCELLED', 'Cancelled')])),
+                        ('start_datetime', models.DateTimeField()),
+                        ('end_datetime', models.DateTimeField()),
+                        ('attendee_full_name', models.CharField(max_length=255)),
+                        ('attendee_email', models.EmailField(max_length=254)),
+                        ('is_active', models.BooleanField()),
+                        ('created_at', models.DateTimeField()),
+                        ('updated_at', models.DateTimeField()),
+                        ('archived_at', models.DateTimeField(auto_now_add=True)),
+                        ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reservations', to='events.event')),
+                    ],
+                ),
+            ],
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+        migrations.AddIndex(
+            model_name='archivedreservation',
+            index=models.Index(fields=['event', 'start_datetime'], name='archived_reservation_event_idx'),
+        ),
+    ]
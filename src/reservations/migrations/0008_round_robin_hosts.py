@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 18:14
+
+from django.conf import settings
+import django.contrib.postgres.constraints
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservations', '0007_archivedreservation'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='reservation',
+            name='reservation_blocked_range_excl',
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='host',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hosted_reservations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('host__isnull', True), ('is_active', True), models.Q(('status', 'CANCELLED'), _negated=True)), expressions=[('event', '='), ('blocked_range', '&&')], name='reservation_blocked_range_excl'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('host__isnull', False), ('is_active', True), models.Q(('status', 'CANCELLED'), _negated=True)), expressions=[('host', '='), ('blocked_range', '&&')], name='reservation_host_blocked_range_excl'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 18:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservations', '0008_round_robin_hosts'),
+    ]
+
+    # Columns added to the partitioned archive on Postgres reach every partition
+    operations = [
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='hold_token',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='archivedreservation',
+            name='host',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_hosted_reservations', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-17 21:05
+
+from django.db import migrations
+
+
+def clear_daily_availability(apps, schema_editor):
+    # Days stored so far may count holds, which are now left out. They are
+    # rebuilt on the next read.
+    DailyAvailability = apps.get_model('reservations', 'DailyAvailability')
+    DailyAvailability.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0009_archivedreservation_host'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_daily_availability, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,22 @@
+from collections import Counter
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 
-from events.models import Event
+from events.models import Event, EventHost
 from commons.enums import ReservationStatus
+from commons.constants import MAX_BUFFER_TIME_IN_MINUTES
+
+
+BLOCKED_RANGE_CONSTRAINT = "reservation_blocked_range_excl"
+HOST_BLOCKED_RANGE_CONSTRAINT = "reservation_host_blocked_range_excl"
+# Spelled out rather than excluding CANCELLED, so that the planner can match
+# the partial index predicate.
+ACTIVE_RESERVATION_STATUSES = [ReservationStatus.SOFT_RESERVED, ReservationStatus.RESERVED]
 
 
 class Reservation(models.Model):
@@ -12,26 +27,248 @@ class Reservation(models.Model):
     attendee_full_name = models.CharField(max_length=255)
     attendee_email = models.EmailField()
     is_active = models.BooleanField(default=True)
+    # Reservation widened by the event's buffers, two blocking reservations
+    # of an event can never overlap on it. Null for group events.
+    blocked_range = DateTimeRangeField(null=True, blank=True, editable=False)
+    # Host a round robin booking was assigned to, it only blocks that host
+    host = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="hosted_reservations"
+    )
+    # Set on soft holds only, they stop blocking the slot after it
+    expires_at = models.DateTimeField(null=True, blank=True)
+    hold_token = models.CharField(max_length=64, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            ExclusionConstraint(
+                name=BLOCKED_RANGE_CONSTRAINT,
+                expressions=[
+                    ("event", RangeOperators.EQUAL),
+                    ("blocked_range", RangeOperators.OVERLAPS),
+                ],
+                condition=(
+                    models.Q(is_active=True, host__isnull=True)
+                    & ~models.Q(status=ReservationStatus.CANCELLED)
+                ),
+            ),
+            # Round robin bookings of one event can overlap with different
+            # hosts, never for the same host across events.
+            ExclusionConstraint(
+                name=HOST_BLOCKED_RANGE_CONSTRAINT,
+                expressions=[
+                    ("host", RangeOperators.EQUAL),
+                    ("blocked_range", RangeOperators.OVERLAPS),
+                ],
+                condition=(
+                    models.Q(is_active=True, host__isnull=False)
+                    & ~models.Q(status=ReservationStatus.CANCELLED)
+                ),
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of an event's reservations
+            models.Index(fields=["event", "start_datetime", "id"], name="reservation_listing_idx"),
+            # Covers _get_active_reservations: equality on the event, then
+            # the range, most selective on end_datetime as history grows.
+            models.Index(
+                fields=["event", "end_datetime", "start_datetime"],
+                name="reservation_active_range_idx",
+                condition=models.Q(is_active=True, status__in=ACTIVE_RESERVATION_STATUSES),
+            ),
+            models.Index(
+                fields=["status", "expires_at"],
+                name="reservation_hold_expiry_idx",
+                condition=models.Q(status=ReservationStatus.SOFT_RESERVED),
+            ),
+        ]
+
     def get_owner_id(self):
         return self.event.organiser_id
 
+    def is_over(self):
+        # Over once no slot starting from now can reach its buffered range
+        return self.end_datetime + timezone.timedelta(minutes=2 * MAX_BUFFER_TIME_IN_MINUTES) < timezone.now()
+
+    def get_blocked_range(self, event):
+        # Group bookings share slots, their capacity is checked on booking
+        if event.is_group_event():
+            return None
+        return DateTimeTZRange(
+            self.start_datetime - timezone.timedelta(minutes=event.before_buffer_time_in_minutes),
+            self.end_datetime + timezone.timedelta(minutes=event.after_buffer_time_in_minutes),
+            bounds="[)"
+        )
+
+    def save(self, *args, **kwargs):
+        self.blocked_range = self.get_blocked_range(self.event)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def update_blocked_ranges(cls, event, batch_size=1000):
+        """
+            Recomputes the blocked range of the event's reservations that are
+            not over yet, after its buffers or capacity changed. Raises an
+            IntegrityError when the new ranges of active ones overlap.
+        """
+        reservations = cls.objects.filter(
+            event_id=event.id,
+            end_datetime__gt=timezone.now()
+        ).only("id", "start_datetime", "end_datetime").order_by("id")
+        batch = []
+        for reservation in reservations.iterator(chunk_size=batch_size):
+            reservation.blocked_range = reservation.get_blocked_range(event)
+            batch.append(reservation)
+            if len(batch) == batch_size:
+                cls.objects.bulk_update(batch, ["blocked_range"])
+                batch = []
+        if batch:
+            cls.objects.bulk_update(batch, ["blocked_range"])
+
     def soft_delete(self):
+        was_blocking = self.is_active and self.status != ReservationStatus.CANCELLED
         self.is_active = False
         self.save(
             force_update=True,
             update_fields=["is_active", "updated_at"]
         )
+        if was_blocking and self.host_id is not None:
+            EventHost.release_bookings(self.event_id, self.host_id)
+
+    @classmethod
+    def confirm_hold(cls, pk, hold_token):
+        # A single conditional update, so that a hold can not be confirmed
+        # after it expired or was reaped.
+        return cls.objects.filter(
+            pk=pk,
+            status=ReservationStatus.SOFT_RESERVED,
+            hold_token=hold_token,
+            expires_at__gt=timezone.now(),
+            is_active=True,
+        ).update(
+            status=ReservationStatus.RESERVED,
+            expires_at=None,
+            hold_token="",
+            updated_at=timezone.now()
+        ) == 1
+
+    @classmethod
+    def expire_holds(cls, batch_size=None, **filters):
+        """
+            Cancels up to batch_size soft holds past their expiry. Returns the
+            (event_id, start_datetime, end_datetime) of the expired holds.
+        """
+        now = timezone.now()
+        stale_holds = cls.objects.filter(
+            status=ReservationStatus.SOFT_RESERVED,
+            expires_at__lte=now,
+            **filters
+        ).values_list("id", "is_active", "host_id", "event_id", "start_datetime", "end_datetime")[:batch_size]
+        stale_holds = list(stale_holds)
+        if stale_holds:
+            cls.objects.filter(
+                pk__in=[hold_id for hold_id, *_ in stale_holds],
+                status=ReservationStatus.SOFT_RESERVED,
+            ).update(status=ReservationStatus.CANCELLED, updated_at=now)
+            # Soft deleted holds were released already
+            released_counts = Counter(
+                (event_id, host_id)
+                for _, is_active, host_id, event_id, *_ in stale_holds
+                if is_active and host_id is not None
+            )
+            for (event_id, host_id), count in released_counts.items():
+                EventHost.release_bookings(event_id, host_id, count)
+        return [hold for _, _, _, *hold in stale_holds]
+
+    @classmethod
+    def get_active_reservations(cls, event_id, start_datetime, end_datetime, include_holds=True):
+        return cls._get_active_reservations(start_datetime, end_datetime, include_holds).filter(event_id=event_id)
+
+    @classmethod
+    def get_active_reservations_for_events(cls, event_ids, start_datetime, end_datetime, include_holds=True):
+        return cls._get_active_reservations(start_datetime, end_datetime, include_holds).filter(
+            event_id__in=event_ids
+        )
+
+    @classmethod
+    def get_live_hold_event_ids(cls, event_ids, host_ids, start_datetime, end_datetime):
+        # Events with a live hold in the range, out of event_ids and the events hosted by host_ids
+        hosted_event_ids = EventHost.objects.filter(user_id__in=host_ids, event__is_active=True).values("event_id")
+        return set(
+            cls._get_active_reservations(start_datetime, end_datetime).filter(
+                models.Q(event_id__in=event_ids) | models.Q(event_id__in=hosted_event_ids),
+                status=ReservationStatus.SOFT_RESERVED
+            ).values_list("event_id", flat=True).distinct()
+        )
 
     @classmethod
-    def get_active_reservations(cls, event_id, start_datetime, end_datetime):
-        return cls.objects.exclude(
-            status=ReservationStatus.CANCELLED
-        ).filter(
-            event_id=event_id,
+    def get_active_reservations_for_organiser(cls, organiser_id, start_datetime, end_datetime):
+        return cls._get_active_reservations(start_datetime, end_datetime).filter(
+            event__organiser_id=organiser_id,
+            event__is_active=True
+        )
+
+    @classmethod
+    def _get_active_reservations(cls, start_datetime, end_datetime, include_holds=True):
+        reservations = cls.objects.filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now()),
+            status__in=ACTIVE_RESERVATION_STATUSES,
             start_datetime__lte=end_datetime,
             end_datetime__gte=start_datetime,
             is_active=True,
         )
+        if not include_holds:
+            reservations = reservations.exclude(status=ReservationStatus.SOFT_RESERVED)
+        return reservations
+
+
+class DailyAvailability(models.Model):
+    """
+        Materialized free time of an event for one UTC day. Bit i of
+        free_cells is set when the i-th MINUTES_MULTIPLE_OF minute cell of the
+        day is in the schedule and not blocked by a buffered reservation.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="daily_availabilities")
+    day = models.DateField()
+    free_cells = models.BinaryField()
+
+    class Meta:
+        unique_together = ["event", "day"]
+
+
+class ArchivedReservation(models.Model):
+    """
+        Reservations moved out of the hot table once they are over, see
+        archive_helper. On Postgres the table is range partitioned by month
+        of start_datetime, with (id, start_datetime) as its primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="archived_reservations")
+    status = models.CharField(choices=ReservationStatus.choices)
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    attendee_full_name = models.CharField(max_length=255)
+    attendee_email = models.EmailField()
+    is_active = models.BooleanField()
+    host = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_hosted_reservations"
+    )
+    expires_at = models.DateTimeField(null=True, blank=True)
+    hold_token = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["event", "start_datetime"], name="archived_reservation_event_idx"),
+        ]
@@ -1,15 +1,28 @@
+import secrets
 from datetime import time
 
 from rest_framework import serializers
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 from commons.serializerfields import TimeZoneField, AutoTzDateTimeField
-from commons.enums import ReservationStatus
-from .models import Reservation
-from .availability_helper import get_available_slots
+from commons.validators import MinutesMultipleOfValidator
+from commons.intervals import to_epoch_minutes
+from commons.enums import ReservationStatus, SchedulingType
+from commons.constants import (
+    MAX_BATCH_AVAILABILITY_EVENTS,
+    MAX_AVAILABLE_SLOTS_LIMIT,
+    MAX_IMPORT_RESERVATIONS,
+    SOFT_HOLD_MINUTES,
+)
+from commons.exceptions import SlotUnavailable, is_constraint_violation
+from .models import Reservation, ArchivedReservation, BLOCKED_RANGE_CONSTRAINT, HOST_BLOCKED_RANGE_CONSTRAINT
+from .availability_helper import is_slot_bookable, lock_booking_events, release_expired_holds
+from .host_helper import assign_round_robin_host
 
 
 class ReservationSerializer(serializers.ModelSerializer):
+    reservation_status = ReservationStatus.RESERVED
     start_datetime = AutoTzDateTimeField()
     end_datetime = AutoTzDateTimeField(read_only=True)
     created_at = AutoTzDateTimeField(read_only=True)
@@ -19,6 +32,7 @@ class ReservationSerializer(serializers.ModelSerializer):
         model = Reservation
         fields = (
             "event",
+            "host",
             "status",
             "start_datetime",
             "end_datetime",
@@ -28,7 +42,7 @@ class ReservationSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("status", "is_active", "end_datetime", "created_at", "updated_at")
+        read_only_fields = ("host", "status", "is_active", "end_datetime", "created_at", "updated_at")
 
     def validate_start_datetime(self, start_datetime):
         if timezone.now() > start_datetime:
@@ -42,20 +56,107 @@ class ReservationSerializer(serializers.ModelSerializer):
         event_start = self.validated_data['start_datetime']
         event_duration_in_mins = timezone.timedelta(minutes=self.validated_data['event'].duration_in_minutes)
         self.validated_data['end_datetime'] = event_start + event_duration_in_mins
-        self.validated_data['status'] = ReservationStatus.RESERVED
-        # TODO: Use distributed locking
-        available_slots = get_available_slots(
-            event_id=self.validated_data["event"].id,
-            start_datetime=event_start,
-            end_datetime=self.validated_data['end_datetime']
-        )
-        available_slots = [slot for slot in available_slots if slot["start_datetime"] == event_start]
-        if not available_slots:
-            raise serializers.ValidationError("Requested slot is not available, please try again")
-        resp = super().save(*args, **kwargs)
+        self.validated_data['status'] = self.reservation_status
+        # The event rows stay locked until the reservation is saved, the
+        # exclusion constraint on blocked_range backs it up.
+        try:
+            with transaction.atomic():
+                # Locked before expiring stale holds bumps the event version,
+                # which would take the event row ahead of the others.
+                lock_booking_events(self.validated_data["event"])
+                # Stale holds count for the constraint until they are expired
+                release_expired_holds(event_id=self.validated_data["event"].id)
+                if not is_slot_bookable(self.validated_data["event"], event_start):
+                    raise serializers.ValidationError("Requested slot is not available, please try again")
+                if self.validated_data["event"].scheduling_type == SchedulingType.ROUND_ROBIN:
+                    self.validated_data["host_id"] = assign_round_robin_host(
+                        self.validated_data["event"],
+                        to_epoch_minutes(event_start)
+                    )
+                    if self.validated_data["host_id"] is None:
+                        raise serializers.ValidationError("Requested slot is not available, please try again")
+                resp = super().save(*args, **kwargs)
+        except IntegrityError as ex:
+            if not (
+                is_constraint_violation(ex, BLOCKED_RANGE_CONSTRAINT)
+                or is_constraint_violation(ex, HOST_BLOCKED_RANGE_CONSTRAINT)
+            ):
+                raise
+            raise SlotUnavailable()
         return resp
 
 
+class ReservationHoldSerializer(ReservationSerializer):
+    reservation_status = ReservationStatus.SOFT_RESERVED
+    expires_at = AutoTzDateTimeField(read_only=True)
+
+    class Meta(ReservationSerializer.Meta):
+        fields = ("id", *ReservationSerializer.Meta.fields, "expires_at", "hold_token")
+        read_only_fields = (*ReservationSerializer.Meta.read_only_fields, "expires_at", "hold_token")
+
+    def save(self, *args, **kwargs):
+        self.validated_data["expires_at"] = timezone.now() + timezone.timedelta(minutes=SOFT_HOLD_MINUTES)
+        self.validated_data["hold_token"] = secrets.token_urlsafe(32)
+        return super().save(*args, **kwargs)
+
+
+class ArchivedReservationSerializer(serializers.ModelSerializer):
+    start_datetime = AutoTzDateTimeField()
+    end_datetime = AutoTzDateTimeField()
+    created_at = AutoTzDateTimeField()
+    updated_at = AutoTzDateTimeField()
+    archived_at = AutoTzDateTimeField()
+
+    class Meta:
+        model = ArchivedReservation
+        fields = (
+            "id",
+            "event",
+            "host",
+            "status",
+            "start_datetime",
+            "end_datetime",
+            "attendee_full_name",
+            "attendee_email",
+            "is_active",
+            "created_at",
+            "updated_at",
+            "archived_at",
+        )
+        read_only_fields = fields
+
+
+class ReservationHoldConfirmSerializer(serializers.Serializer):
+    hold_token = serializers.CharField(max_length=64)
+
+
+class ReservationExportRequestSerializer(serializers.Serializer):
+    event_id = serializers.IntegerField()
+
+
+class ReservationImportRowSerializer(serializers.Serializer):
+    # Plain ids, events of the whole batch are looked up in one query
+    event = serializers.IntegerField()
+    start_datetime = serializers.DateTimeField(validators=[MinutesMultipleOfValidator()])
+    attendee_full_name = serializers.CharField(max_length=255)
+    attendee_email = serializers.EmailField()
+
+    def validate_start_datetime(self, start_datetime):
+        if timezone.now() > start_datetime:
+            raise serializers.ValidationError("Start date should be in future")
+        return start_datetime
+
+
+class ReservationImportSerializer(serializers.Serializer):
+    # Rows are validated one by one by the import so that a bad row does not
+    # reject the batch.
+    reservations = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=MAX_IMPORT_RESERVATIONS
+    )
+
+
 class AvailabilityRequestSerializer(serializers.Serializer):
     event_id = serializers.IntegerField()
     start_date = serializers.DateField()
@@ -63,6 +164,7 @@ class AvailabilityRequestSerializer(serializers.Serializer):
     start_datetime = serializers.DateTimeField(read_only=True)
     end_datetime = serializers.DateTimeField(read_only=True)
     timezone = TimeZoneField()
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=MAX_AVAILABLE_SLOTS_LIMIT)
 
     def validate(self, data):
         start_date = data["start_date"]
@@ -80,6 +182,35 @@ class AvailabilityRequestSerializer(serializers.Serializer):
         return data
 
 
+class BatchAvailabilityRequestSerializer(AvailabilityRequestSerializer):
+    event_id = None
+    event_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=MAX_BATCH_AVAILABILITY_EVENTS
+    )
+
+    limit = None
+
+    def validate_event_ids(self, event_ids):
+        return list(dict.fromkeys(event_ids))
+
+
+class FreeBusyRequestSerializer(AvailabilityRequestSerializer):
+    event_id = None
+    limit = None
+
+
+class NextAvailabilityRequestSerializer(serializers.Serializer):
+    event_id = serializers.IntegerField()
+    after = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(default=1, min_value=1, max_value=MAX_AVAILABLE_SLOTS_LIMIT)
+    timezone = TimeZoneField()
+
+    def validate_after(self, after):
+        return max(after, timezone.now())
+
+
 # class AvailableSlotSerializer(serializers.Serializer):
 #     start_datetime = serializers.DateTimeField()
 
@@ -0,0 +1,108 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from events.models import Event, EventHost
+from events.signals import event_blocking_changed
+from schedules.models import Schedule, WeekDaySchedule, CustomDateSchedule
+from schedules.signals import schedule_changed
+from commons.enums import ReservationStatus
+from .models import Reservation
+from .availability_helper import get_host_ids, invalidate_host_events, mark_reservation_stored_cells
+from .availability_store import clear_stored_days, get_changed_days_filter
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def bump_version_on_reservation_change(sender, instance, **kwargs):
+    if instance.is_over():
+        return
+    Event.bump_availability_version(pk=instance.event_id)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def update_stored_cells_on_reservation_change(sender, instance, created=False, **kwargs):
+    if instance.is_over():
+        return
+    event = Event.objects.filter(pk=instance.event_id).first()
+    if event is None:
+        return
+    is_reserved = (
+        created
+        and instance.is_active
+        and instance.status != ReservationStatus.CANCELLED
+    )
+    mark_reservation_stored_cells(instance, event, is_reserved)
+
+
+@receiver(post_save, sender=Event)
+def clear_stored_days_on_event_change(sender, instance, created, **kwargs):
+    # Schedule and buffers may have changed, days are rebuilt on next read
+    if not created:
+        clear_stored_days(event_id=instance.id)
+        if instance.has_hosts():
+            invalidate_host_events(get_host_ids(instance))
+
+
+@receiver(event_blocking_changed)
+def update_blocked_ranges_on_event_change(sender, event, **kwargs):
+    Reservation.update_blocked_ranges(event)
+
+
+@receiver(post_save, sender=EventHost)
+@receiver(post_delete, sender=EventHost)
+def bump_version_on_host_change(sender, instance, **kwargs):
+    Event.bump_availability_version(pk=instance.event_id)
+    # The host's own events now gain or lose the event's bookings
+    invalidate_host_events([instance.user_id])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(pre_delete, sender=Schedule)
+def bump_version_on_schedule_change(sender, instance, **kwargs):
+    Event.bump_availability_version(schedule_id=instance.id)
+    clear_stored_days(event__schedule_id=instance.id)
+
+
+@receiver(schedule_changed)
+def bump_version_on_schedule_rows_change(sender, schedule, changed_weekdays=None, changed_ranges=None, **kwargs):
+    Event.bump_availability_version(schedule_id=schedule.id)
+    if changed_weekdays is None or changed_ranges is None:
+        clear_stored_days(event__schedule_id=schedule.id)
+    else:
+        # Other days of the events are still valid
+        clear_stored_days(
+            get_changed_days_filter(changed_weekdays, changed_ranges),
+            event__schedule_id=schedule.id
+        )
+
+
+@receiver(post_save, sender=WeekDaySchedule)
+@receiver(post_save, sender=CustomDateSchedule)
+def bump_version_on_schedule_row_save(sender, instance, **kwargs):
+    # A row saved on its own, e.g. from the admin, may have moved to any day
+    send_schedule_row_changed(instance)
+
+
+@receiver(post_delete, sender=WeekDaySchedule)
+def bump_version_on_weekday_schedule_delete(sender, instance, **kwargs):
+    send_schedule_row_changed(instance, changed_weekdays={instance.day_of_week}, changed_ranges=[])
+
+
+@receiver(post_delete, sender=CustomDateSchedule)
+def bump_version_on_custom_schedule_delete(sender, instance, **kwargs):
+    send_schedule_row_changed(
+        instance,
+        changed_weekdays=set(),
+        changed_ranges=[(instance.start_datetime, instance.end_datetime)]
+    )
+
+
+def send_schedule_row_changed(instance, changed_weekdays=None, changed_ranges=None):
+    Schedule.bump_version(pk=instance.schedule_id)
+    schedule_changed.send(
+        sender=type(instance),
+        schedule=Schedule(pk=instance.schedule_id),
+        changed_weekdays=changed_weekdays,
+        changed_ranges=changed_ranges
+    )
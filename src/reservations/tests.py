@@ -1,3 +1,1218 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import zoneinfo
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from commons.intervals import IntervalSet, count_overlaps, covered_at_depth, max_overlaps, to_epoch_minutes
+from commons.timezones import get_utc_offset, get_utc_offsets, group_by_local_date
+
+from commons.enums import ReservationStatus, SchedulingType
+from events.models import Event, EventHost
+from schedules.models import Schedule
+from .models import Reservation, ArchivedReservation, DailyAvailability
+from .archive_helper import archive_reservations
+from .availability_helper import release_expired_holds
+
+
+class IntervalSetTest(SimpleTestCase):
+    def assertIntervals(self, interval_set, intervals):
+        self.assertEqual(list(zip(interval_set.starts.tolist(), interval_set.ends.tolist())), intervals)
+
+    def test_from_intervals_merges_overlapping_and_touching(self):
+        interval_set = IntervalSet.from_intervals([30, 0, 10, 50, 60], [40, 10, 20, 50, 70])
+        self.assertIntervals(interval_set, [(0, 20), (30, 40), (60, 70)])
+
+    def test_negate(self):
+        interval_set = IntervalSet.from_intervals([10, 30], [20, 40])
+        self.assertIntervals(interval_set.negate(0, 50), [(0, 10), (20, 30), (40, 50)])
+        self.assertIntervals(interval_set.negate(10, 40), [(20, 30)])
+        self.assertIntervals(IntervalSet().negate(0, 50), [(0, 50)])
+
+    def test_intersect_and_union(self):
+        first = IntervalSet.from_intervals([0, 30], [20, 50])
+        second = IntervalSet.from_intervals([10, 40], [35, 60])
+        self.assertIntervals(first.intersect(second), [(10, 20), (30, 35), (40, 50)])
+        self.assertIntervals(first.union(second), [(0, 60)])
+
+    def test_covers(self):
+        interval_set = IntervalSet.from_intervals([0, 30], [20, 50])
+        self.assertEqual(
+            interval_set.covers([0, 10, 15, 30, -5], [20, 20, 35, 50, 5]).tolist(),
+            [True, True, False, True, False]
+        )
+        self.assertEqual(IntervalSet().covers([0], [10]).tolist(), [False])
+
+    def test_split_into_slots_follows_the_grid(self):
+        interval_set = IntervalSet.from_intervals([5, 100], [70, 160])
+        self.assertEqual(interval_set.split_into_slots(0, 30).tolist(), [30, 120])
+        self.assertEqual(interval_set.split_into_slots(10, 30).tolist(), [10, 40, 100, 130])
+
+    def test_split_into_slots_fits_the_duration(self):
+        interval_set = IntervalSet.from_intervals([0], [120])
+        self.assertEqual(interval_set.split_into_slots(0, 30, 60).tolist(), [0, 30, 60])
+        self.assertEqual(interval_set.split_into_slots(0, 30, 150).tolist(), [])
+
+    def test_count_overlaps(self):
+        points, depth = count_overlaps([0, 10, 20], [20, 30, 30])
+        self.assertEqual(points.tolist(), [0, 10, 20, 20, 30, 30])
+        self.assertEqual(depth.tolist(), [1, 2, 1, 2, 1, 0])
+
+    def test_covered_at_depth(self):
+        starts, ends = [0, 10, 20], [20, 30, 30]
+        self.assertIntervals(covered_at_depth(starts, ends, 2), [(10, 30)])
+        self.assertIntervals(covered_at_depth(starts, ends, 3), [])
+        self.assertIntervals(covered_at_depth([], [], 1), [])
+
+    def test_max_overlaps(self):
+        starts, ends = [0, 10, 20], [20, 30, 30]
+        self.assertEqual(
+            max_overlaps(starts, ends, [0, 0, 20, 30, 40], [10, 15, 30, 40, 50]).tolist(),
+            [1, 2, 2, 0, 0]
+        )
+
+
+class LocalTimezoneTest(SimpleTestCase):
+    ZONE = zoneinfo.ZoneInfo("America/New_York")
+
+    def to_minutes(self, month, day, hour, minute=0):
+        return to_epoch_minutes(datetime.datetime(2024, month, day, hour, minute, tzinfo=datetime.timezone.utc))
+
+    def test_offsets_match_the_zone_around_transitions(self):
+        for month, day in ((3, 10), (11, 3)):
+            start = self.to_minutes(month, day, 0)
+            minutes = list(range(start - 60, start + 24 * 60, 15))
+            self.assertEqual(
+                get_utc_offsets(minutes, self.ZONE).tolist(),
+                [get_utc_offset(value, self.ZONE) for value in minutes]
+            )
+
+    def test_slots_are_grouped_by_local_date_across_transitions(self):
+        minutes = [self.to_minutes(3, 10, 4, 30), self.to_minutes(3, 10, 6, 30), self.to_minutes(3, 10, 7)]
+        self.assertEqual(group_by_local_date(minutes, self.ZONE), [
+            ("2024-03-09", ["2024-03-09T23:30:00-05:00"]),
+            ("2024-03-10", ["2024-03-10T01:30:00-05:00", "2024-03-10T03:00:00-04:00"]),
+        ])
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN output is Postgres specific")
+class ActiveReservationsQueryPlanTest(TestCase):
+    EVENT_COUNT = 20
+    RESERVATIONS_PER_EVENT = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        organiser = get_user_model().objects.create_user(username="organiser", password="password")
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timezone.timedelta(days=365)
+        events = Event.objects.bulk_create([
+            Event(
+                organiser=organiser,
+                title="Event {}".format(i),
+                slug="event-{}".format(i),
+                start_datetime=start,
+                end_datetime=start + timezone.timedelta(days=730),
+            )
+            for i in range(cls.EVENT_COUNT)
+        ])
+        statuses = [ReservationStatus.RESERVED, ReservationStatus.CANCELLED, ReservationStatus.SOFT_RESERVED]
+        Reservation.objects.bulk_create([
+            Reservation(
+                event=event,
+                status=statuses[i % len(statuses)],
+                start_datetime=start + timezone.timedelta(hours=i),
+                end_datetime=start + timezone.timedelta(hours=i + 1),
+                attendee_full_name="Attendee",
+                attendee_email="attendee@example.com",
+                is_active=i % 7 != 0,
+            )
+            for event in events
+            for i in range(cls.RESERVATIONS_PER_EVENT)
+        ])
+        cls.event = events[0]
+        cls.start = start
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE {}".format(Reservation._meta.db_table))
+
+    def test_active_reservations_use_partial_index(self):
+        start_datetime = self.start + timezone.timedelta(days=7)
+        plan = Reservation.get_active_reservations(
+            event_id=self.event.id,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(days=7)
+        ).explain()
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn("reservation_active_range_idx", plan)
+
+
+class ReservationQueryCountTest(TestCase):
+    RESERVATION_COUNT = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timezone.timedelta(days=1)
+        cls.event = Event.objects.create(
+            organiser=cls.user,
+            title="Event",
+            slug="event",
+            start_datetime=start,
+            end_datetime=start + timezone.timedelta(days=30),
+        )
+        cls.reservations = [
+            Reservation.objects.create(
+                event=cls.event,
+                status=ReservationStatus.RESERVED,
+                start_datetime=start + timezone.timedelta(hours=i),
+                end_datetime=start + timezone.timedelta(hours=i, minutes=30),
+                attendee_full_name="Attendee",
+                attendee_email="attendee@example.com",
+            )
+            for i in range(cls.RESERVATION_COUNT)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get("/reservation-service/api/reservations", {"event_id": self.event.id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["results"]), self.RESERVATION_COUNT)
+
+    def test_retrieve(self):
+        # The owner check reads the event loaded along with the reservation
+        with self.assertNumQueries(1):
+            resp = self.client.get(
+                "/reservation-service/api/reservations/{}".format(self.reservations[0].id),
+                {"event_id": self.event.id}
+            )
+        self.assertEqual(resp.status_code, 200)
+
+
+class AvailabilityApiTestCase(TestCase):
+    @classmethod
+    def create_event(cls, start_time, end_time, **kwargs):
+        schedule = Schedule.create_schedule(
+            None,
+            "Schedule",
+            cls.user.id,
+            [{"day_of_week": day, "start_time": start_time, "end_time": end_time} for day in range(7)],
+            []
+        )
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return Event.objects.create(
+            organiser=cls.user,
+            title="Event",
+            slug="event-{}".format(Event.objects.count()),
+            start_datetime=start,
+            end_datetime=start + timezone.timedelta(days=30),
+            schedule=schedule,
+            **kwargs
+        )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        cls.date = (timezone.now() + timezone.timedelta(days=3)).date()
+
+    def setUp(self):
+        # Compiled schedules and free time are cached by ids the rolled back
+        # tests reuse.
+        cache.clear()
+        self.client = APIClient()
+
+    def get_listed_slots(self, event, user_timezone="UTC"):
+        resp = self.client.get("/reservation-service/api/availabilities", {
+            "event_id": event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": user_timezone,
+        })
+        self.assertEqual(resp.status_code, 200)
+        return [slot for group in resp.json() for slot in group["available_slots"]]
+
+    def get_listed_starts(self, event, user_timezone="UTC"):
+        return [slot["start_datetime"] for slot in self.get_listed_slots(event, user_timezone)]
+
+    def book(self, event, start_datetime):
+        return self.client.post("/reservation-service/api/reservations", {
+            "event": event.id,
+            "start_datetime": start_datetime,
+            "attendee_full_name": "Attendee",
+            "attendee_email": "attendee@example.com",
+        }, format="json")
+
+    def get_slot_start(self, hour, minute=0):
+        # As listed in UTC
+        return datetime.datetime.combine(self.date, datetime.time(hour, minute)).isoformat() + "Z"
+
+
+class BookListedSlotsTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(3, 30),
+            datetime.time(11, 30),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+
+    def test_listed_slots_in_non_utc_timezone_are_bookable(self):
+        slots = self.get_listed_starts(self.event, "America/Los_Angeles")
+        self.assertTrue(slots)
+        for start_datetime in slots:
+            resp = self.book(self.event, start_datetime)
+            self.assertEqual(resp.status_code, 201, (start_datetime, resp.content))
+        self.assertEqual(self.get_listed_starts(self.event, "America/Los_Angeles"), [])
+
+    def test_slot_grid_does_not_depend_on_timezone(self):
+        utc_slots = {
+            datetime.datetime.fromisoformat(slot.replace("Z", "+00:00"))
+            for slot in self.get_listed_starts(self.event)
+        }
+        for slot in self.get_listed_starts(self.event, "Asia/Kolkata"):
+            start_datetime = datetime.datetime.fromisoformat(slot)
+            if start_datetime.date() == self.date:
+                self.assertIn(start_datetime, utc_slots)
+
+    def test_import_rejects_minutes_off_the_multiple(self):
+        self.client.force_authenticate(self.user)
+        rows = [
+            {
+                "event": self.event.id,
+                "start_datetime": self.get_slot_start(4, minute),
+                "attendee_full_name": "Attendee",
+                "attendee_email": "attendee@example.com",
+            }
+            for minute in [37, 30]
+        ]
+        resp = self.client.post("/reservation-service/api/reservations/bulk", {"reservations": rows}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["created"], 1)
+        self.assertEqual([error["index"] for error in resp.json()["errors"]], [0])
+
+
+class DurationLongerThanStepTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=30
+        )
+
+    def test_slots_fit_the_duration(self):
+        starts = self.get_listed_starts(self.event)
+        self.assertEqual(starts, [
+            self.get_slot_start(hour, minute)
+            for hour, minute in [(9, 0), (9, 30), (10, 0), (10, 30), (11, 0)]
+        ])
+
+    def test_every_listed_slot_is_bookable(self):
+        booked = []
+        starts = self.get_listed_starts(self.event)
+        while starts:
+            resp = self.book(self.event, starts[0])
+            self.assertEqual(resp.status_code, 201, (starts[0], resp.content))
+            booked.append(starts[0])
+            starts = self.get_listed_starts(self.event)
+        self.assertEqual(len(booked), 3)
+
+
+class GroupSlotsTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=30,
+            capacity=2
+        )
+
+    def reserve(self, hour):
+        start_datetime = datetime.datetime.combine(self.date, datetime.time(hour), datetime.timezone.utc)
+        return Reservation.objects.create(
+            event=self.event,
+            status=ReservationStatus.RESERVED,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(minutes=self.event.duration_in_minutes),
+            attendee_full_name="Attendee",
+            attendee_email="attendee@example.com",
+        )
+
+    def test_seats_left(self):
+        self.reserve(10)
+        slots = self.get_listed_slots(self.event)
+        self.assertEqual(
+            [(slot["start_datetime"], slot["seats_left"]) for slot in slots],
+            [
+                (self.get_slot_start(9), 2),
+                (self.get_slot_start(9, 30), 1),
+                (self.get_slot_start(10), 1),
+                (self.get_slot_start(10, 30), 1),
+                (self.get_slot_start(11), 2),
+            ]
+        )
+
+    def test_compact_format_carries_seats_left(self):
+        self.reserve(10)
+        resp = self.client.get("/reservation-service/api/availabilities", {
+            "event_id": self.event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+            "format": "compact",
+        })
+        self.assertEqual(resp.status_code, 200)
+        availabilities = resp.json()["availabilities"]
+        self.assertEqual(len(availabilities), 1)
+        self.assertEqual(availabilities[0]["runs"], [[0, 1, 2], [30, 3, 1], [120, 1, 2]])
+
+    def test_full_slots_are_not_listed(self):
+        self.reserve(10)
+        self.reserve(10)
+        self.assertEqual(
+            [(slot["start_datetime"], slot["seats_left"]) for slot in self.get_listed_slots(self.event)],
+            [
+                (self.get_slot_start(9), 2),
+                (self.get_slot_start(11), 2),
+            ]
+        )
+        resp = self.book(self.event, self.get_slot_start(9, 30))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_every_listed_seat_is_bookable(self):
+        booked = 0
+        slots = self.get_listed_slots(self.event)
+        while slots:
+            resp = self.book(self.event, slots[0]["start_datetime"])
+            self.assertEqual(resp.status_code, 201, (slots[0], resp.content))
+            booked += 1
+            slots = self.get_listed_slots(self.event)
+        # Two seats each at 09:00, 10:00 and 11:00
+        self.assertEqual(booked, 6)
+
+    def test_import_fills_seats(self):
+        self.client.force_authenticate(self.user)
+        rows = [
+            {
+                "event": self.event.id,
+                "start_datetime": self.get_slot_start(hour, minute),
+                "attendee_full_name": "Attendee",
+                "attendee_email": "attendee@example.com",
+            }
+            for hour, minute in [(10, 0), (10, 0), (10, 30), (11, 0), (9, 0)]
+        ]
+        resp = self.client.post("/reservation-service/api/reservations/bulk", {"reservations": rows}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["created"], 4)
+        self.assertEqual([error["index"] for error in resp.json()["errors"]], [2])
+
+
+class RoundRobinImportTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = get_user_model().objects.create_user(username="host", password="password")
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60,
+            scheduling_type=SchedulingType.ROUND_ROBIN
+        )
+        for user in (cls.user, cls.other_user):
+            EventHost.objects.create(event=cls.event, user=user, schedule=cls.event.schedule)
+
+    def test_import_assigns_hosts(self):
+        self.client.force_authenticate(self.user)
+        rows = [
+            {
+                "event": self.event.id,
+                "start_datetime": self.get_slot_start(hour),
+                "attendee_full_name": "Attendee",
+                "attendee_email": "attendee@example.com",
+            }
+            for hour in [10, 10, 10, 11]
+        ]
+        resp = self.client.post("/reservation-service/api/reservations/bulk", {"reservations": rows}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["created"], 3)
+        self.assertEqual([error["index"] for error in resp.json()["errors"]], [2])
+
+        ten_am_host_ids = Reservation.objects.filter(
+            event=self.event,
+            start_datetime=self.get_slot_start(10)
+        ).values_list("host_id", flat=True)
+        self.assertEqual(set(ten_am_host_ids), {self.user.id, self.other_user.id})
+        self.assertEqual(
+            sorted(EventHost.objects.filter(event=self.event).values_list("booking_count", flat=True)),
+            [1, 2]
+        )
+        self.assertEqual(self.book(self.event, self.get_slot_start(10)).status_code, 400)
+
+
+class ArchiveReservationsTest(AvailabilityApiTestCase):
+    def test_archive_keeps_host_and_hold(self):
+        event = self.create_event(datetime.time(9), datetime.time(12))
+        start_datetime = timezone.now().replace(microsecond=0) - timezone.timedelta(days=90)
+        reservation = Reservation.objects.create(
+            event=event,
+            host=self.user,
+            status=ReservationStatus.SOFT_RESERVED,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(hours=1),
+            attendee_full_name="Attendee",
+            attendee_email="attendee@example.com",
+            expires_at=start_datetime,
+            hold_token="token",
+        )
+        self.assertEqual(archive_reservations(timezone.now(), batch_size=10), 1)
+        archived = ArchivedReservation.objects.get(pk=reservation.pk)
+        self.assertEqual(archived.host_id, self.user.id)
+        self.assertEqual(archived.expires_at, start_datetime)
+        self.assertEqual(archived.hold_token, "token")
+        self.assertFalse(Reservation.objects.filter(pk=reservation.pk).exists())
+
+    def test_archived_reservations_are_listed_and_exported(self):
+        event = self.create_event(datetime.time(9), datetime.time(12))
+        start_datetime = timezone.now().replace(microsecond=0) - timezone.timedelta(days=90)
+        past_reservation, reservation = [
+            Reservation.objects.create(
+                event=event,
+                status=ReservationStatus.RESERVED,
+                start_datetime=value,
+                end_datetime=value + timezone.timedelta(hours=1),
+                attendee_full_name="Attendee",
+                attendee_email="attendee@example.com",
+            )
+            for value in (start_datetime, start_datetime + timezone.timedelta(days=120))
+        ]
+        archive_reservations(timezone.now() - timezone.timedelta(days=1), batch_size=10)
+
+        self.client.force_authenticate(self.user)
+        resp = self.client.get("/reservation-service/api/reservations/archived", {"event_id": event.id})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["id"] for row in resp.json()["results"]], [past_reservation.id])
+
+        resp = self.client.get("/reservation-service/api/reservations/export", {"event_id": event.id, "format": "csv"})
+        self.assertEqual(resp.status_code, 200)
+        lines = b"".join(resp.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(
+            [line.split(",")[0] for line in lines],
+            ["id", str(past_reservation.id), str(reservation.id)]
+        )
+
+
+class HoldTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(11),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+
+    def hold(self, start_datetime):
+        return self.client.post("/reservation-service/api/reservations/hold", {
+            "event": self.event.id,
+            "start_datetime": start_datetime,
+            "attendee_full_name": "Attendee",
+            "attendee_email": "attendee@example.com",
+        }, format="json")
+
+    def confirm(self, hold, hold_token):
+        return self.client.post(
+            "/reservation-service/api/reservations/{}/confirm".format(hold["id"]),
+            {"hold_token": hold_token},
+            format="json"
+        )
+
+    def test_hold_blocks_the_slot_until_confirmed(self):
+        # Stored and cached before the hold
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(9), self.get_slot_start(10)])
+        resp = self.hold(self.get_slot_start(9))
+        self.assertEqual(resp.status_code, 201)
+        hold = resp.json()
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(10)])
+        self.assertEqual(self.book(self.event, self.get_slot_start(9)).status_code, 400)
+
+        self.assertEqual(self.confirm(hold, "wrong").status_code, 409)
+        resp = self.confirm(hold, hold["hold_token"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["status"], ReservationStatus.RESERVED)
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(10)])
+
+    def test_expired_hold_frees_the_slot(self):
+        self.get_listed_starts(self.event)
+        hold = self.hold(self.get_slot_start(9)).json()
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(10)])
+        Reservation.objects.filter(pk=hold["id"]).update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        # Listed again before the hold is expired in the database
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(9), self.get_slot_start(10)])
+        self.assertEqual(self.confirm(hold, hold["hold_token"]).status_code, 409)
+        self.assertEqual(self.book(self.event, self.get_slot_start(9)).status_code, 201)
+        self.assertEqual(
+            Reservation.objects.get(pk=hold["id"]).status,
+            ReservationStatus.CANCELLED
+        )
+
+    def test_import_expires_stale_holds(self):
+        hold = self.hold(self.get_slot_start(9)).json()
+        Reservation.objects.filter(pk=hold["id"]).update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        self.client.force_authenticate(self.user)
+        resp = self.client.post("/reservation-service/api/reservations/bulk", {"reservations": [{
+            "event": self.event.id,
+            "start_datetime": self.get_slot_start(9),
+            "attendee_full_name": "Attendee",
+            "attendee_email": "attendee@example.com",
+        }]}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"created": 1, "errors": []})
+        self.assertEqual(Reservation.objects.get(pk=hold["id"]).status, ReservationStatus.CANCELLED)
+
+
+class FreeBusyTest(AvailabilityApiTestCase):
+    def reserve(self, event, hour, minute=0):
+        start_datetime = datetime.datetime.combine(self.date, datetime.time(hour, minute), datetime.timezone.utc)
+        return Reservation.objects.create(
+            event=event,
+            status=ReservationStatus.RESERVED,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(minutes=event.duration_in_minutes),
+            attendee_full_name="Attendee",
+            attendee_email="attendee@example.com",
+        )
+
+    def test_busy_time_merges_events_with_their_buffers(self):
+        first_event = self.create_event(datetime.time(9), datetime.time(17), after_buffer_time_in_minutes=15)
+        second_event = self.create_event(datetime.time(9), datetime.time(17), before_buffer_time_in_minutes=15)
+        self.reserve(first_event, 9)
+        self.reserve(second_event, 10, 30)
+        self.reserve(second_event, 14)
+
+        self.client.force_authenticate(self.user)
+        resp = self.client.get("/reservation-service/api/freebusy", {
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [(busy["start_datetime"], busy["end_datetime"]) for busy in resp.json()["busy"]],
+            [
+                (self.get_slot_start(9), self.get_slot_start(11, 30)),
+                (self.get_slot_start(13, 45), self.get_slot_start(15)),
+            ]
+        )
+
+
+class CollectiveEventTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = get_user_model().objects.create_user(username="host", password="password")
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60,
+            scheduling_type=SchedulingType.COLLECTIVE
+        )
+        other_schedule = Schedule.create_schedule(
+            None,
+            "Schedule",
+            cls.other_user.id,
+            [{"day_of_week": day, "start_time": datetime.time(10), "end_time": datetime.time(17)} for day in range(7)],
+            []
+        )
+        EventHost.objects.create(event=cls.event, user=cls.user, schedule=cls.event.schedule)
+        EventHost.objects.create(event=cls.event, user=cls.other_user, schedule=other_schedule)
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        cls.other_event = Event.objects.create(
+            organiser=cls.other_user,
+            title="Other event",
+            slug="other-event",
+            start_datetime=start,
+            end_datetime=start + timezone.timedelta(days=30),
+            schedule=other_schedule,
+        )
+
+    def test_slots_need_every_host(self):
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(10), self.get_slot_start(11)])
+
+    def test_host_booking_elsewhere_blocks_the_slot(self):
+        self.assertEqual(self.book(self.other_event, self.get_slot_start(11)).status_code, 201)
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(10)])
+        self.assertEqual(self.book(self.event, self.get_slot_start(11)).status_code, 400)
+        self.assertEqual(self.book(self.event, self.get_slot_start(10)).status_code, 201)
+
+    def test_booking_takes_up_the_hosts_own_events(self):
+        own_event = self.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+        self.assertEqual(
+            self.get_listed_starts(own_event),
+            [self.get_slot_start(9), self.get_slot_start(10), self.get_slot_start(11)]
+        )
+        self.assertEqual(self.book(self.event, self.get_slot_start(10)).status_code, 201)
+        self.assertEqual(self.get_listed_starts(own_event), [self.get_slot_start(9), self.get_slot_start(11)])
+        self.assertEqual(self.book(own_event, self.get_slot_start(10)).status_code, 400)
+        self.assertEqual(self.book(self.other_event, self.get_slot_start(10)).status_code, 400)
+
+        self.assertEqual(self.book(own_event, self.get_slot_start(11)).status_code, 201)
+        self.assertEqual(self.get_listed_starts(self.event), [])
+
+    def test_listing_is_never_not_modified(self):
+        # Bookings of the hosts' other events do not change the event's version
+        resp = self.client.get("/reservation-service/api/availabilities", {
+            "event_id": self.event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+        }, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.has_header("ETag"))
+
+
+class EventBlockingChangeTest(AvailabilityApiTestCase):
+    def reserve(self, event, hour):
+        start_datetime = datetime.datetime.combine(self.date, datetime.time(hour), datetime.timezone.utc)
+        return Reservation.objects.create(
+            event=event,
+            status=ReservationStatus.RESERVED,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(minutes=event.duration_in_minutes),
+            attendee_full_name="Attendee",
+            attendee_email="attendee@example.com",
+        )
+
+    def update_event(self, event, data):
+        self.client.force_authenticate(self.user)
+        resp = self.client.patch("/event-service/api/events/{}".format(event.id), data, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+
+    def assertBlockedRange(self, reservation, event):
+        reservation.refresh_from_db()
+        self.assertEqual(str(reservation.blocked_range), str(reservation.get_blocked_range(event)))
+
+    def test_buffer_change_updates_blocked_ranges(self):
+        event = self.create_event(datetime.time(9), datetime.time(17), before_buffer_time_in_minutes=30)
+        reservation = self.reserve(event, 10)
+        self.update_event(event, {"before_buffer_time_in_minutes": 0, "after_buffer_time_in_minutes": 15})
+        event.refresh_from_db()
+        self.assertBlockedRange(reservation, event)
+
+    def test_capacity_change_updates_blocked_ranges(self):
+        event = self.create_event(datetime.time(9), datetime.time(17), capacity=2)
+        reservation = self.reserve(event, 10)
+        self.assertIsNone(Reservation.objects.get(pk=reservation.pk).blocked_range)
+        self.update_event(event, {"capacity": 1})
+        event.refresh_from_db()
+        self.assertBlockedRange(reservation, event)
+        self.assertIsNotNone(reservation.blocked_range)
+
+
+class ScheduleRowChangeTest(AvailabilityApiTestCase):
+    def test_deleted_weekday_only_clears_its_days(self):
+        event = self.create_event(datetime.time(9), datetime.time(17))
+        self.get_listed_starts(event)
+        stored_days = set(DailyAvailability.objects.filter(event=event).values_list("day", flat=True))
+        self.assertEqual(len(stored_days), 3)
+
+        removed_weekday = self.date.weekday()
+        Schedule.create_schedule(
+            event.schedule,
+            "Schedule",
+            self.user.id,
+            [
+                {"day_of_week": day, "start_time": datetime.time(9), "end_time": datetime.time(17)}
+                for day in range(7) if day != removed_weekday
+            ],
+            []
+        )
+        self.assertEqual(
+            set(DailyAvailability.objects.filter(event=event).values_list("day", flat=True)),
+            {day for day in stored_days if day.weekday() != removed_weekday}
+        )
+        self.assertEqual(self.get_listed_starts(event), [])
+
+
+class RoundRobinLoadTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60,
+            scheduling_type=SchedulingType.ROUND_ROBIN
+        )
+        EventHost.objects.create(event=cls.event, user=cls.user, schedule=cls.event.schedule)
+
+    def get_booking_count(self):
+        return EventHost.objects.get(event=self.event, user=self.user).booking_count
+
+    def test_cancelled_booking_is_released(self):
+        resp = self.book(self.event, self.get_slot_start(9))
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.get_booking_count(), 1)
+
+        reservation = Reservation.objects.get(event=self.event)
+        self.client.force_authenticate(self.user)
+        resp = self.client.delete(
+            "/reservation-service/api/reservations/{}?event_id={}".format(reservation.id, self.event.id)
+        )
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self.get_booking_count(), 0)
+
+    def test_expired_hold_is_released(self):
+        resp = self.client.post("/reservation-service/api/reservations/hold", {
+            "event": self.event.id,
+            "start_datetime": self.get_slot_start(9),
+            "attendee_full_name": "Attendee",
+            "attendee_email": "attendee@example.com",
+        }, format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.get_booking_count(), 1)
+
+        Reservation.objects.filter(pk=resp.json()["id"]).update(expires_at=timezone.now())
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(self.get_booking_count(), 0)
+
+
+class AvailabilityCacheTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+
+    def test_repeated_listing_is_cached(self):
+        self.get_listed_starts(self.event)
+        # The event and the live hold check
+        with self.assertNumQueries(2):
+            self.get_listed_starts(self.event)
+
+    def test_writes_invalidate_the_cached_listing(self):
+        self.assertEqual(
+            self.get_listed_starts(self.event),
+            [self.get_slot_start(9), self.get_slot_start(10), self.get_slot_start(11)]
+        )
+        start_datetime = datetime.datetime.combine(self.date, datetime.time(10), datetime.timezone.utc)
+        reservation = Reservation.objects.create(
+            event=self.event,
+            status=ReservationStatus.RESERVED,
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timezone.timedelta(hours=1),
+            attendee_full_name="Attendee",
+            attendee_email="attendee@example.com",
+        )
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(9), self.get_slot_start(11)])
+
+        reservation.soft_delete()
+        self.assertEqual(
+            self.get_listed_starts(self.event),
+            [self.get_slot_start(9), self.get_slot_start(10), self.get_slot_start(11)]
+        )
+
+        Schedule.create_schedule(
+            self.event.schedule,
+            "Schedule",
+            self.user.id,
+            [{"day_of_week": day, "start_time": datetime.time(9), "end_time": datetime.time(10)} for day in range(7)],
+            []
+        )
+        self.assertEqual(self.get_listed_starts(self.event), [self.get_slot_start(9)])
+
+
+class BatchAvailabilityTest(AvailabilityApiTestCase):
+    def get_batch(self, events):
+        resp = self.client.get("/reservation-service/api/availabilities/batch", {
+            "event_ids": [event.id for event in events],
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+        })
+        self.assertEqual(resp.status_code, 200)
+        return {
+            availability["event_id"]: [
+                slot["start_datetime"] for group in availability["availabilities"] for slot in group["available_slots"]
+            ]
+            for availability in resp.json()
+        }
+
+    def test_batch_matches_single_listings(self):
+        events = [
+            self.create_event(datetime.time(hour), datetime.time(hour + 2), duration_in_minutes=60, step_in_minutes=60)
+            for hour in (9, 13)
+        ]
+        self.assertEqual(self.book(events[0], self.get_slot_start(9)).status_code, 201)
+        cache.clear()
+        self.assertEqual(
+            self.get_batch(events),
+            {event.id: self.get_listed_starts(event) for event in events}
+        )
+
+    def test_query_count_does_not_grow_with_events(self):
+        events = [self.create_event(datetime.time(9), datetime.time(17)) for _ in range(4)]
+        with CaptureQueriesContext(connection) as single_queries:
+            self.get_batch(events[:1])
+        cache.clear()
+        with CaptureQueriesContext(connection) as batch_queries:
+            self.get_batch(events)
+        self.assertEqual(len(batch_queries), len(single_queries))
+
+    def test_missing_events_are_rejected(self):
+        event = self.create_event(datetime.time(9), datetime.time(17))
+        resp = self.client.get("/reservation-service/api/availabilities/batch", {
+            "event_ids": [event.id, 0],
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+        })
+        self.assertEqual(resp.status_code, 400)
+
+
+class NextAvailabilityTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+
+    def test_limit_keeps_the_first_slots(self):
+        resp = self.client.get("/reservation-service/api/availabilities", {
+            "event_id": self.event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date + datetime.timedelta(days=7)),
+            "timezone": "UTC",
+            "limit": 2,
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [slot["start_datetime"] for group in resp.json() for slot in group["available_slots"]],
+            [self.get_slot_start(9), self.get_slot_start(10)]
+        )
+
+    def test_next_slots_run_into_the_following_days(self):
+        self.assertEqual(self.book(self.event, self.get_slot_start(10)).status_code, 201)
+        resp = self.client.get("/reservation-service/api/availabilities/next", {
+            "event_id": self.event.id,
+            "after": self.get_slot_start(9, 30),
+            "limit": 3,
+            "timezone": "UTC",
+        })
+        self.assertEqual(resp.status_code, 200)
+        next_date = self.date + datetime.timedelta(days=1)
+        self.assertEqual(resp.json(), [
+            {"date": str(self.date), "available_slots": [{"start_datetime": self.get_slot_start(11)}]},
+            {
+                "date": str(next_date),
+                "available_slots": [
+                    {"start_datetime": "{}T09:00:00Z".format(next_date)},
+                    {"start_datetime": "{}T10:00:00Z".format(next_date)},
+                ],
+            },
+        ])
+
+
+class NDJSONAvailabilityTest(AvailabilityApiTestCase):
+    def get_availabilities(self, event, **params):
+        return self.client.get("/reservation-service/api/availabilities", {
+            "event_id": event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date + datetime.timedelta(days=9)),
+            "timezone": "Asia/Kolkata",
+            **params
+        })
+
+    def test_lines_match_the_json_listing(self):
+        event = self.create_event(datetime.time(9), datetime.time(12), duration_in_minutes=60, step_in_minutes=60)
+        self.assertEqual(self.book(event, self.get_slot_start(10)).status_code, 201)
+        resp = self.get_availabilities(event, format="ndjson")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = b"".join(resp.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual([json.loads(line) for line in lines], self.get_availabilities(event).json())
+
+    def test_group_lines_carry_seats_left(self):
+        event = self.create_event(datetime.time(9), datetime.time(10), duration_in_minutes=60, capacity=2)
+        self.assertEqual(self.book(event, self.get_slot_start(9)).status_code, 201)
+        lines = b"".join(self.get_availabilities(event, format="ndjson").streaming_content).splitlines()
+        self.assertEqual(
+            json.loads(lines[0])["available_slots"],
+            [{"start_datetime": "{}T14:30:00+05:30".format(self.date), "seats_left": 1}]
+        )
+
+
+class DailyAvailabilityTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(
+            datetime.time(9),
+            datetime.time(12),
+            duration_in_minutes=60,
+            step_in_minutes=60
+        )
+
+    def get_stored_listing(self):
+        # Skips the cached free time, so that the stored days are read
+        cache.clear()
+        return self.get_listed_starts(self.event)
+
+    def test_bookings_flip_the_stored_cells(self):
+        self.get_listed_starts(self.event)
+        stored_days = dict(DailyAvailability.objects.filter(event=self.event).values_list("day", "id"))
+
+        self.assertEqual(self.book(self.event, self.get_slot_start(10)).status_code, 201)
+        self.assertEqual(self.get_stored_listing(), [self.get_slot_start(9), self.get_slot_start(11)])
+
+        reservation = Reservation.objects.get(event=self.event)
+        self.client.force_authenticate(self.user)
+        resp = self.client.delete(
+            "/reservation-service/api/reservations/{}?event_id={}".format(reservation.id, self.event.id)
+        )
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(
+            self.get_stored_listing(),
+            [self.get_slot_start(9), self.get_slot_start(10), self.get_slot_start(11)]
+        )
+        # Updated in place rather than rebuilt
+        self.assertEqual(
+            dict(DailyAvailability.objects.filter(event=self.event).values_list("day", "id")),
+            stored_days
+        )
+
+
+class CustomDateOverrideTest(AvailabilityApiTestCase):
+    def test_custom_date_replaces_the_weekday_hours(self):
+        event = self.create_event(datetime.time(9), datetime.time(12), duration_in_minutes=60, step_in_minutes=60)
+        self.assertEqual(len(self.get_listed_starts(event)), 3)
+
+        day_start = datetime.datetime.combine(self.date, datetime.time(0), datetime.timezone.utc)
+        Schedule.create_schedule(
+            event.schedule,
+            "Schedule",
+            self.user.id,
+            [{"day_of_week": day, "start_time": datetime.time(9), "end_time": datetime.time(12)} for day in range(7)],
+            [{
+                "start_datetime": day_start,
+                "end_datetime": day_start + timezone.timedelta(days=1),
+                "start_time": datetime.time(14),
+                "end_time": datetime.time(16),
+            }]
+        )
+        self.assertEqual(self.get_listed_starts(event), [self.get_slot_start(14), self.get_slot_start(15)])
+
+        resp = self.client.get("/reservation-service/api/availabilities/batch", {
+            "event_ids": [event.id],
+            "start_date": str(self.date),
+            "end_date": str(self.date + datetime.timedelta(days=1)),
+            "timezone": "UTC",
+        })
+        self.assertEqual(resp.status_code, 200)
+        next_date = self.date + datetime.timedelta(days=1)
+        self.assertEqual(
+            [
+                slot["start_datetime"]
+                for group in resp.json()[0]["availabilities"]
+                for slot in group["available_slots"]
+            ],
+            [
+                self.get_slot_start(14),
+                self.get_slot_start(15),
+                "{}T09:00:00Z".format(next_date),
+                "{}T10:00:00Z".format(next_date),
+                "{}T11:00:00Z".format(next_date),
+            ]
+        )
+
+
+class CompactAvailabilityTest(AvailabilityApiTestCase):
+    def get_availabilities(self, event, **params):
+        resp = self.client.get("/reservation-service/api/availabilities", {
+            "event_id": event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date + datetime.timedelta(days=2)),
+            "timezone": "UTC",
+            **params
+        })
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_runs_skip_the_booked_slots(self):
+        event = self.create_event(datetime.time(9), datetime.time(12), duration_in_minutes=30, step_in_minutes=30)
+        self.assertEqual(self.book(event, self.get_slot_start(10)).status_code, 201)
+        compact = self.get_availabilities(event, format="compact")
+        self.assertEqual(compact["step_in_minutes"], 30)
+        self.assertEqual(compact["availabilities"][0], {
+            "date": str(self.date),
+            "start_datetime": self.get_slot_start(9),
+            "runs": [[0, 2], [90, 3]],
+        })
+
+        # Expanding the runs gives back the plain listing
+        step = timezone.timedelta(minutes=compact["step_in_minutes"])
+        expanded = []
+        for availability in compact["availabilities"]:
+            first_start = datetime.datetime.fromisoformat(availability["start_datetime"].replace("Z", "+00:00"))
+            expanded.append([
+                first_start + timezone.timedelta(minutes=run_offset) + step * position
+                for run_offset, run_length in availability["runs"]
+                for position in range(run_length)
+            ])
+        self.assertEqual(expanded, [
+            [
+                datetime.datetime.fromisoformat(slot["start_datetime"].replace("Z", "+00:00"))
+                for slot in group["available_slots"]
+            ]
+            for group in self.get_availabilities(event)
+        ])
+
+
+class ConditionalAvailabilityTest(AvailabilityApiTestCase):
+    def get_availabilities(self, event, **headers):
+        return self.client.get("/reservation-service/api/availabilities", {
+            "event_id": event.id,
+            "start_date": str(self.date),
+            "end_date": str(self.date),
+            "timezone": "UTC",
+        }, **headers)
+
+    def test_unchanged_listing_is_not_modified(self):
+        event = self.create_event(datetime.time(9), datetime.time(12), duration_in_minutes=60, step_in_minutes=60)
+        # The ETag changes with the current minute
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now()):
+            resp = self.get_availabilities(event)
+            self.assertEqual(resp.status_code, 200)
+            etag = resp["ETag"]
+
+            resp = self.get_availabilities(event, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp["ETag"], etag)
+            self.assertEqual(resp.content, b"")
+
+            self.assertEqual(self.book(event, self.get_slot_start(10)).status_code, 201)
+            resp = self.get_availabilities(event, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotEqual(resp["ETag"], etag)
+            self.assertEqual(len(resp.json()[0]["available_slots"]), 2)
+
+
+class ReservationPaginationTest(AvailabilityApiTestCase):
+    def test_pages_follow_start_and_id_across_ties(self):
+        event = self.create_event(datetime.time(9), datetime.time(12), capacity=5)
+        start_datetime = datetime.datetime.combine(self.date, datetime.time(9), datetime.timezone.utc)
+        reservations = Reservation.objects.bulk_create([
+            Reservation(
+                event=event,
+                status=ReservationStatus.RESERVED,
+                start_datetime=start_datetime + timezone.timedelta(hours=hours),
+                end_datetime=start_datetime + timezone.timedelta(hours=hours, minutes=30),
+                attendee_full_name="Attendee {}".format(position),
+                attendee_email="attendee@example.com",
+            )
+            for position, hours in enumerate((1, 0, 1, 0, 2))
+        ])
+        expected_names = [
+            reservation.attendee_full_name
+            for reservation in sorted(reservations, key=lambda row: (row.start_datetime, row.id))
+        ]
+
+        self.client.force_authenticate(self.user)
+        url, listed_names = "/reservation-service/api/reservations?event_id={}&page_size=2".format(event.id), []
+        while url is not None:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertLessEqual(len(resp.json()["results"]), 2)
+            listed_names += [row["attendee_full_name"] for row in resp.json()["results"]]
+            url = resp.json()["next"]
+        self.assertEqual(listed_names, expected_names)
+
+        resp = self.client.get("/reservation-service/api/reservations", {"event_id": event.id, "cursor": "broken"})
+        self.assertEqual(resp.status_code, 404)
+
+
+class ReservationExportTest(AvailabilityApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.event = cls.create_event(datetime.time(9), datetime.time(12))
+        Event.objects.filter(pk=cls.event.pk).update(title="Intro, call")
+        start_datetime = datetime.datetime.combine(cls.date, datetime.time(9), datetime.timezone.utc)
+        cls.reservations = [
+            Reservation.objects.create(
+                event=cls.event,
+                status=ReservationStatus.RESERVED,
+                start_datetime=start_datetime + timezone.timedelta(hours=hours),
+                end_datetime=start_datetime + timezone.timedelta(hours=hours, minutes=30),
+                attendee_full_name=attendee_full_name,
+                attendee_email="attendee@example.com",
+            )
+            for hours, attendee_full_name in ((1, '=HYPERLINK("x"), "{}"'.format("Doe" * 30)), (0, "Attendee"))
+        ]
+        cls.reservations[1].soft_delete()
+
+    def export(self, export_format):
+        self.client.force_authenticate(self.user)
+        resp = self.client.get(
+            "/reservation-service/api/reservations/export",
+            {"event_id": self.event.id, "format": export_format}
+        )
+        self.assertEqual(resp.status_code, 200)
+        return b"".join(resp.streaming_content).decode("utf-8")
+
+    def test_csv_escapes_formulas(self):
+        rows = list(csv.reader(io.StringIO(self.export("csv"))))
+        self.assertEqual(rows[0][:2], ["id", "status"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.reservations[1].id), str(self.reservations[0].id)])
+        self.assertEqual(rows[2][4], "'" + self.reservations[0].attendee_full_name)
+
+    def test_ics_has_an_event_per_active_reservation(self):
+        content = self.export("ics")
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(content.endswith("END:VCALENDAR\r\n"))
+        lines = content.split("\r\n")[:-1]
+        # The long attendee line is folded
+        self.assertTrue(all(len(line.encode("utf-8")) <= 75 for line in lines))
+        self.assertTrue(any(line.startswith(" ") for line in lines))
+        self.assertEqual(lines.count("BEGIN:VEVENT"), 1)
+        self.assertIn("UID:reservation-{}@eventchimp".format(self.reservations[0].id), lines)
+        self.assertIn("SUMMARY:Intro\\, call", lines)
+
+    def test_other_organisers_can_not_export(self):
+        self.client.force_authenticate(get_user_model().objects.create_user(username="other", password="password"))
+        resp = self.client.get("/reservation-service/api/reservations/export", {"event_id": self.event.id})
+        self.assertEqual(resp.status_code, 404)
@@ -1,10 +1,19 @@
 from django.urls import path, include
 
-from .views import reservation_router, GetAvailabiltiyApiView
+from .views import (
+    reservation_router,
+    GetAvailabiltiyApiView,
+    GetBatchAvailabilityApiView,
+    GetNextAvailabilityApiView,
+    GetFreeBusyApiView,
+)
 
 
 app_name = "reservations"
 urlpatterns = [
     path('api/', include((reservation_router.urls, 'reservations'))),
     path('api/availabilities', GetAvailabiltiyApiView.as_view()),
+    path('api/availabilities/batch', GetBatchAvailabilityApiView.as_view()),
+    path('api/availabilities/next', GetNextAvailabilityApiView.as_view()),
+    path('api/freebusy', GetFreeBusyApiView.as_view()),
 ]
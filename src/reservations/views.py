@@ -1,3 +1,7 @@
+import numpy as np
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from django.utils import timezone
 from rest_framework import (
     viewsets,
@@ -7,22 +11,65 @@ from rest_framework import (
     views,
     permissions
 )
+from rest_framework.decorators import action
+from rest_framework.settings import api_settings
 
+from commons.pagination import KeysetPagination
 from commons.permissions import IsOwner
-from .models import Reservation
-from .availability_helper import get_available_slots
+from commons.exceptions import SlotUnavailable
+from commons.renderers import (
+    NDJSONRenderer,
+    CompactJSONRenderer,
+    CSVRenderer,
+    ICalendarRenderer,
+    to_ndjson_line,
+)
+from commons.intervals import to_epoch_minutes
+from commons.timezones import (
+    group_by_local_date,
+    split_by_local_date,
+    format_local_datetimes,
+    get_utc_offsets,
+)
+from events.models import Event
+from .models import Reservation, ArchivedReservation
+from .availability_helper import (
+    confirm_hold,
+    get_availability_etag,
+    get_available_slot_starts,
+    get_available_slot_chunks,
+    get_available_slot_starts_for_events,
+    get_next_available_slot_starts,
+    get_busy_intervals,
+    get_seats_left,
+)
+from .import_helper import import_reservations
+from .export_helper import iter_csv_export, iter_ics_export
 from .serializers import (
     ReservationSerializer,
+    ArchivedReservationSerializer,
+    ReservationHoldSerializer,
+    ReservationHoldConfirmSerializer,
+    ReservationImportSerializer,
+    ReservationExportRequestSerializer,
     AvailabilityRequestSerializer,
+    BatchAvailabilityRequestSerializer,
+    NextAvailabilityRequestSerializer,
+    FreeBusyRequestSerializer,
 )
 
 
+class ReservationPagination(KeysetPagination):
+    ordering = ("start_datetime", "id")
+
+
 class ReservationViewSet(viewsets.ModelViewSet):
     http_method_names = ('get', 'post', 'options', 'delete')
     serializer_class = ReservationSerializer
+    pagination_class = ReservationPagination
 
     def get_permissions(self):
-        if self.request.method == 'POST':
+        if self.action in ('create', 'hold', 'confirm'):
             return [permissions.AllowAny()]
         return [IsOwner()]
 
@@ -30,10 +77,11 @@ class ReservationViewSet(viewsets.ModelViewSet):
         event_id = self.request.query_params.get('event_id', None)
 
         if event_id is not None:
+            # The event is loaded along for owner checks and soft deletes
             return Reservation.objects.filter(
                 event_id=event_id,
                 event__organiser_id=self.request.user
-            )
+            ).select_related("event")
 
         return Reservation.objects.none()
 
@@ -42,9 +90,70 @@ class ReservationViewSet(viewsets.ModelViewSet):
         reservation.soft_delete()
         return response.Response({}, status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        serializer = ReservationHoldSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        serializer = ReservationHoldConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reservation = confirm_hold(pk=pk, hold_token=serializer.validated_data["hold_token"])
+        if reservation is None:
+            raise SlotUnavailable("Hold has expired or is not valid")
+        return response.Response(
+            ReservationSerializer(reservation, context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        # Past reservations moved out of the listing above by the archival
+        event_id = request.query_params.get('event_id', None)
+        queryset = ArchivedReservation.objects.none()
+        if event_id is not None:
+            queryset = ArchivedReservation.objects.filter(event_id=event_id, event__organiser_id=request.user)
+        page = self.paginate_queryset(queryset)
+        serializer = ArchivedReservationSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, ICalendarRenderer])
+    def export(self, request):
+        serializer = ReservationExportRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Looked up before streaming so that a missing event is still a 404
+        event = get_object_or_404(Event, pk=serializer.validated_data["event_id"], organiser=request.user)
+        if request.accepted_renderer.format == ICalendarRenderer.format:
+            content, filename = iter_ics_export(event), "reservations-{}.ics".format(event.id)
+        else:
+            content, filename = iter_csv_export(event.id), "reservations-{}.csv".format(event.id)
+        return StreamingHttpResponse(
+            content,
+            content_type="{}; charset=utf-8".format(request.accepted_renderer.media_type),
+            headers={"Content-Disposition": 'attachment; filename="{}"'.format(filename)}
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_import(self, request):
+        serializer = ReservationImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        created_count, errors = import_reservations(
+            rows=serializer.validated_data["reservations"],
+            organiser_id=request.user.id
+        )
+        return response.Response({"created": created_count, "errors": errors}, status=status.HTTP_200_OK)
+
 
 class GetAvailabiltiyApiView(views.APIView):
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CompactJSONRenderer]
 
     def get(self, request):
         serializer = AvailabilityRequestSerializer(data=request.query_params)
@@ -52,40 +161,225 @@ class GetAvailabiltiyApiView(views.APIView):
             return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         user_timezone = serializer.validated_data["timezone"]
-        event_id = serializer.validated_data["event_id"]
-        available_slots = get_available_slots(
-            event_id=event_id,
+        # Looked up before streaming so that a missing event is still a 404
+        event = get_object_or_404(Event, pk=serializer.validated_data["event_id"])
+        etag = get_availability_etag(event, request.query_params, request.accepted_renderer.format)
+        headers = {"ETag": etag} if etag is not None else {}
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag is not None and (etag in if_none_match or "*" in if_none_match):
+            return response.Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            slot_chunks = get_available_slot_chunks(
+                event=event,
+                start_datetime=serializer.validated_data["start_datetime"],
+                end_datetime=serializer.validated_data["end_datetime"],
+                limit=serializer.validated_data.get("limit"),
+            )
+            return StreamingHttpResponse(
+                iter_ndjson_slots_by_date(
+                    slot_chunks,
+                    user_timezone,
+                    group_event=event if event.is_group_event() else None
+                ),
+                content_type=NDJSONRenderer.media_type,
+                headers=headers
+            )
+
+        slot_starts = get_available_slot_starts(
+            event=event,
             start_datetime=serializer.validated_data["start_datetime"],
             end_datetime=serializer.validated_data["end_datetime"],
+            limit=serializer.validated_data.get("limit"),
         )
-        for idx in range(len(available_slots)):
-            available_slots[idx]["start_datetime"] = timezone.localtime(
-                available_slots[idx]["start_datetime"],
-                user_timezone
+        if request.accepted_renderer.format == CompactJSONRenderer.format and event.is_group_event():
+            seats_left = get_seats_left(event, slot_starts)
+            resp = encode_slot_runs_by_date(
+                slot_starts[seats_left > 0],
+                user_timezone,
+                event.step_in_minutes,
+                seats_left=seats_left[seats_left > 0]
             )
-            available_slots[idx]["end_datetime"] = timezone.localtime(
-                available_slots[idx]["end_datetime"],
-                user_timezone
+        elif request.accepted_renderer.format == CompactJSONRenderer.format:
+            resp = encode_slot_runs_by_date(slot_starts, user_timezone, event.step_in_minutes)
+        elif event.is_group_event():
+            seats_left = get_seats_left(event, slot_starts)
+            resp = group_slots_by_date(
+                slot_starts[seats_left > 0],
+                user_timezone,
+                seats_left=seats_left[seats_left > 0]
             )
+        else:
+            resp = group_slots_by_date(slot_starts, user_timezone)
+        return response.Response(resp, status=status.HTTP_200_OK, headers=headers)
+
+
+class GetFreeBusyApiView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        serializer = FreeBusyRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        busy_intervals = get_busy_intervals(
+            organiser_id=request.user.id,
+            start_datetime=serializer.validated_data["start_datetime"],
+            end_datetime=serializer.validated_data["end_datetime"],
+        )
+        resp = {"busy": format_datetime_intervals(busy_intervals, serializer.validated_data["timezone"])}
+        return response.Response(resp, status=status.HTTP_200_OK)
 
-        available_slots_by_date = {}
-        for slot in available_slots:
-            slot_start = slot["start_datetime"]
-            slot_start_date = slot_start.date()
-            if slot_start.date() not in available_slots_by_date:
-                available_slots_by_date[slot_start_date] = []
-            available_slots_by_date[slot_start_date].append(slot)
-
-        resp = []
-        for slot_date, slots in available_slots_by_date.items():
-            resp.append(
-                {
-                    "date": slot_date,
-                    "available_slots": [{"start_datetime": slot["start_datetime"]} for slot in slots]
-                }
+
+class GetNextAvailabilityApiView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        serializer = NextAvailabilityRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user_timezone = serializer.validated_data["timezone"]
+        slot_starts = get_next_available_slot_starts(
+            event_id=serializer.validated_data["event_id"],
+            not_before=serializer.validated_data.get("after", timezone.now()),
+            limit=serializer.validated_data["limit"],
+        )
+        resp = group_slots_by_date(slot_starts, user_timezone)
+        return response.Response(resp, status=status.HTTP_200_OK)
+
+
+class GetBatchAvailabilityApiView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        serializer = BatchAvailabilityRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user_timezone = serializer.validated_data["timezone"]
+        event_ids = serializer.validated_data["event_ids"]
+        slot_starts_by_event = get_available_slot_starts_for_events(
+            event_ids=event_ids,
+            start_datetime=serializer.validated_data["start_datetime"],
+            end_datetime=serializer.validated_data["end_datetime"],
+        )
+        missing_event_ids = [event_id for event_id in event_ids if event_id not in slot_starts_by_event]
+        if missing_event_ids:
+            return response.Response(
+                {"event_ids": [f"Events {missing_event_ids} do not exist"]},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        resp = [
+            {
+                "event_id": event_id,
+                "availabilities": group_slots_by_date(slot_starts_by_event[event_id], user_timezone),
+            }
+            for event_id in event_ids
+        ]
         return response.Response(resp, status=status.HTTP_200_OK)
 
 
+def format_datetime_intervals(intervals, user_timezone):
+    minutes = np.array(
+        [to_epoch_minutes(value) for interval in intervals for value in interval],
+        dtype=np.int64
+    )
+    offsets = get_utc_offsets(minutes, user_timezone)
+    datetimes = format_local_datetimes(minutes + offsets, offsets)
+    return [
+        {"start_datetime": start_datetime, "end_datetime": end_datetime}
+        for start_datetime, end_datetime in zip(datetimes[::2], datetimes[1::2])
+    ]
+
+
+def iter_ndjson_slots_by_date(slot_chunks, user_timezone, group_event=None):
+    # Slots arrive in order, so a date's group is complete once a slot of the
+    # next date shows up and only one group is held at a time.
+    slot_date, slots = None, []
+    for slot_starts in slot_chunks:
+        seats_left = None
+        if group_event is not None:
+            seats_left = get_seats_left(group_event, slot_starts)
+            slot_starts, seats_left = slot_starts[seats_left > 0], seats_left[seats_left > 0]
+        for group_date, group_slots in iter_slots_by_date(slot_starts, user_timezone, seats_left):
+            if group_date != slot_date:
+                if slots:
+                    yield to_ndjson_line(to_slot_group(slot_date, slots))
+                slot_date, slots = group_date, []
+            slots += group_slots
+    if slots:
+        yield to_ndjson_line(to_slot_group(slot_date, slots))
+
+
+def group_slots_by_date(slot_starts, user_timezone, seats_left=None):
+    return [
+        to_slot_group(slot_date, slots)
+        for slot_date, slots in iter_slots_by_date(slot_starts, user_timezone, seats_left)
+    ]
+
+
+def iter_slots_by_date(slot_starts, user_timezone, seats_left=None):
+    # seats_left, when given, is aligned with slot_starts and only sent for group events
+    position = 0
+    for slot_date, start_datetimes in group_by_local_date(slot_starts, user_timezone):
+        if seats_left is None:
+            slots = [{"start_datetime": start_datetime} for start_datetime in start_datetimes]
+        else:
+            slots = [
+                {"start_datetime": start_datetime, "seats_left": int(seats)}
+                for start_datetime, seats in zip(start_datetimes, seats_left[position:])
+            ]
+        position += len(start_datetimes)
+        yield slot_date, slots
+
+
+def encode_slot_runs_by_date(slot_starts, user_timezone, step_in_minutes, seats_left=None):
+    """
+        Compact form of group_slots_by_date. Each date carries its first slot
+        and runs of [minutes after that slot, number of consecutive slots],
+        so the size grows with the gaps rather than with the slots. With
+        seats_left, runs also break where the seats change and carry them as
+        a third value.
+    """
+    dates, group_starts, group_ends, offsets = split_by_local_date(slot_starts, user_timezone)
+    first_start_datetimes = format_local_datetimes(
+        slot_starts[group_starts] + offsets[group_starts], offsets[group_starts]
+    )
+    is_run_start = np.ones(len(slot_starts), dtype=bool)
+    is_run_start[1:] = np.diff(slot_starts) != step_in_minutes
+    if seats_left is not None:
+        is_run_start[1:] |= np.diff(seats_left) != 0
+    is_run_start[group_starts] = True
+    run_starts = np.flatnonzero(is_run_start)
+    run_lengths = np.diff(np.append(run_starts, len(slot_starts)))
+    run_groups = np.searchsorted(group_starts, run_starts, side="right") - 1
+    run_offsets = slot_starts[run_starts] - slot_starts[group_starts][run_groups]
+    run_columns = [run_offsets, run_lengths]
+    if seats_left is not None:
+        run_columns.append(seats_left[run_starts])
+    runs = np.stack(run_columns, axis=1).tolist()
+    group_run_bounds = np.searchsorted(run_groups, np.arange(len(dates) + 1))
+    return {
+        "step_in_minutes": step_in_minutes,
+        "availabilities": [
+            {
+                "date": slot_date,
+                "start_datetime": first_start_datetime,
+                "runs": runs[group_run_bounds[idx]:group_run_bounds[idx + 1]],
+            }
+            for idx, (slot_date, first_start_datetime) in enumerate(zip(dates, first_start_datetimes))
+        ],
+    }
+
+
+def to_slot_group(slot_date, slots):
+    return {
+        "date": slot_date,
+        "available_slots": slots
+    }
+
+
 reservation_router = routers.DefaultRouter(trailing_slash=False)
 reservation_router.register(r'reservations', ReservationViewSet, basename='reservations')
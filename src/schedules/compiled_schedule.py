@@ -0,0 +1,79 @@
+import numpy as np
+
+from commons.constants import MINUTES_IN_DAY
+from commons.intervals import IntervalSet, to_epoch_minutes
+
+
+MINUTES_IN_WEEK = 7 * MINUTES_IN_DAY
+# 1970-01-05 00:00 UTC, the first Monday after the epoch
+WEEK_ORIGIN_MINUTES = 4 * MINUTES_IN_DAY
+
+
+def get_minutes_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+class CompiledSchedule:
+    """
+        Weekday rules of a schedule merged into minute offsets from Monday
+        00:00 UTC, so that expanding them over a range is array arithmetic.
+    """
+    __slots__ = ("week_intervals",)
+
+    def __init__(self, week_intervals):
+        self.week_intervals = week_intervals
+
+    @classmethod
+    def from_weekday_schedules(cls, weekday_schedules):
+        starts, ends = [], []
+        for weekday_schedule in weekday_schedules:
+            day_offset = weekday_schedule.day_of_week * MINUTES_IN_DAY
+            # An end time of 00:00 closes the rule at the following midnight
+            end_minutes = get_minutes_of_day(weekday_schedule.end_time) or MINUTES_IN_DAY
+            starts.append(day_offset + get_minutes_of_day(weekday_schedule.start_time))
+            ends.append(day_offset + end_minutes)
+        return cls(IntervalSet.from_intervals(starts, ends))
+
+    def expand(self, start_minutes, end_minutes, custom_schedules=()):
+        """
+            custom_schedules are (start_datetime, end_datetime, start_time,
+            end_time) rows overlapping the range; their days replace the
+            weekday rules.
+        """
+        weekly_intervals = self._expand_weeks(start_minutes, end_minutes)
+        custom_days, custom_intervals = get_custom_date_intervals(custom_schedules)
+        if not len(custom_days):
+            return weekly_intervals
+        weekly_intervals = weekly_intervals.intersect(custom_days.negate(start_minutes, end_minutes))
+        return weekly_intervals.union(custom_intervals).clip(start_minutes, end_minutes)
+
+    def _expand_weeks(self, start_minutes, end_minutes):
+        if not len(self.week_intervals) or start_minutes >= end_minutes:
+            return IntervalSet()
+
+        first_week = (start_minutes - WEEK_ORIGIN_MINUTES) // MINUTES_IN_WEEK
+        last_week = (end_minutes - 1 - WEEK_ORIGIN_MINUTES) // MINUTES_IN_WEEK
+        week_starts = WEEK_ORIGIN_MINUTES + MINUTES_IN_WEEK * np.arange(
+            first_week, last_week + 1, dtype=np.int64
+        )
+        starts = (week_starts[:, np.newaxis] + self.week_intervals.starts).ravel()
+        ends = (week_starts[:, np.newaxis] + self.week_intervals.ends).ravel()
+        # Merges Sunday evenings into the following Monday mornings
+        return IntervalSet.from_intervals(starts, ends).clip(start_minutes, end_minutes)
+
+
+def get_custom_date_intervals(custom_schedules):
+    day_starts, day_ends, starts, ends = [], [], [], []
+    for start_datetime, end_datetime, start_time, end_time in custom_schedules:
+        day_start = to_epoch_minutes(start_datetime)
+        day_end = to_epoch_minutes(end_datetime, round_up=True)
+        # Times are stored in UTC while the day starts at the user's local
+        # midnight, so they are placed relative to the start of the day.
+        day_offset = day_start % MINUTES_IN_DAY
+        start_offset = (get_minutes_of_day(start_time) - day_offset) % MINUTES_IN_DAY
+        end_offset = (get_minutes_of_day(end_time) - day_offset) % MINUTES_IN_DAY or MINUTES_IN_DAY
+        day_starts.append(day_start)
+        day_ends.append(day_end)
+        starts.append(day_start + start_offset)
+        ends.append(min(day_start + end_offset, day_end))
+    return IntervalSet.from_intervals(day_starts, day_ends), IntervalSet.from_intervals(starts, ends)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0002_alter_customdateschedule_schedule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
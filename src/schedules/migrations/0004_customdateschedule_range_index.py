@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0003_schedule_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customdateschedule',
+            index=models.Index(fields=['schedule', 'start_datetime', 'end_datetime'], name='schedules_c_schedul_900538_idx'),
+        ),
+    ]
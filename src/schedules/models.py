@@ -1,23 +1,28 @@
-import zoneinfo
-
 from django.db import models
 from django.db import transaction
 from django.conf import settings
-from django.utils import timezone
-from datetime import time
+from django.core.cache import cache
 
 from commons.enums import Weekday
-from .utils import get_datetime_intervals
+from commons.intervals import from_epoch_minutes
+from .compiled_schedule import CompiledSchedule
+from .signals import schedule_changed
+from .utils import diff_schedule_rows
 
 
 class Schedule(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=120)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     def get_owner_id(self):
         return self.user_id
 
+    @classmethod
+    def bump_version(cls, **filters):
+        cls.objects.filter(**filters).update(version=models.F("version") + 1)
+
     @classmethod
     @transaction.atomic
     def create_schedule(
@@ -33,60 +38,65 @@ class Schedule(models.Model):
                 user_id=user_id,
                 name=name
             )
+            weekday_schedules, custom_schedules = [], []
         else:
-            schedule_instance.weekday_schedules.all().delete()
-            schedule_instance.custom_schedules.all().delete()
-
-        WeekDaySchedule.objects.bulk_create([
-                WeekDaySchedule(schedule=schedule_instance, **data)
-                for data in weekday_schedule_data
-            ])
-
-        CustomDateSchedule.objects.bulk_create([
-            CustomDateSchedule(schedule=schedule_instance, **data)
-            for data in custom_schedule_data
-        ])
+            weekday_schedules = list(schedule_instance.weekday_schedules.all())
+            custom_schedules = list(schedule_instance.custom_schedules.all())
+
+        # Only rows that differ from the submitted ones are written
+        weekday_changes = apply_schedule_row_changes(
+            schedule=schedule_instance,
+            model=WeekDaySchedule,
+            existing_rows=weekday_schedules,
+            submitted_rows=weekday_schedule_data or [],
+            fields=("day_of_week", "start_time", "end_time"),
+            group_field="day_of_week"
+        )
+        custom_changes = apply_schedule_row_changes(
+            schedule=schedule_instance,
+            model=CustomDateSchedule,
+            existing_rows=custom_schedules,
+            submitted_rows=custom_schedule_data or [],
+            fields=("start_datetime", "end_datetime", "start_time", "end_time"),
+            group_field="start_datetime"
+        )
+        changed_weekdays = {row["day_of_week"] for row in weekday_changes}
+        changed_ranges = sorted({(row["start_datetime"], row["end_datetime"]) for row in custom_changes})
+        if not changed_weekdays and not changed_ranges:
+            return schedule_instance
+
+        Schedule.bump_version(pk=schedule_instance.pk)
+        schedule_instance.refresh_from_db(fields=["version"])
+        schedule_changed.send(
+            sender=cls,
+            schedule=schedule_instance,
+            changed_weekdays=changed_weekdays,
+            changed_ranges=changed_ranges
+        )
         return schedule_instance
 
-    def get_schedule(self, start_datetime, end_datetime):
-        schedules_by_weekday = {}
-        for schedule in self.weekday_schedules.values():
-            day_of_week = schedule["day_of_week"]
-            if day_of_week not in schedules_by_weekday:
-                schedules_by_weekday[day_of_week] = []
-            schedules_by_weekday[schedule["day_of_week"]].append(schedule)
-
-        # custom_schedules = self.custom_schedules.filter(
-        #     start_datetime__lte=end_datetime,
-        #     end_datetime__gte=start_datetime
-        # )
-
-        datetime_intervals = get_datetime_intervals(
-            start_datetime=start_datetime,
-            end_datetime=end_datetime
-        )
-        schedules = []
-        for interval in datetime_intervals:
-            day_of_week = interval["day_of_week"]
-            if day_of_week in schedules_by_weekday:
-                weekday_schedules = schedules_by_weekday[day_of_week]
-                for weekday_schedule in weekday_schedules:
-                    start_datetime = timezone.datetime.combine(
-                        interval["start_datetime"], weekday_schedule["start_time"], zoneinfo.ZoneInfo("utc")
-                    )
-                    end_datetime = timezone.datetime.combine(
-                        interval["start_datetime"], weekday_schedule["end_time"], zoneinfo.ZoneInfo("utc")
-                    )
-                    if weekday_schedule["end_time"] == time(0, 0):
-                        end_datetime += timezone.timedelta(days=1)
-                    schedules.append(
-                        {
-                            "start_datetime": max(start_datetime, interval["start_datetime"]),
-                            "end_datetime": min(end_datetime,  interval["end_datetime"])
-                        }
-                    )
-
-        return schedules
+    def get_compiled_schedule(self):
+        version, compiled_schedule = getattr(self, "_compiled_schedule", (None, None))
+        if version == self.version:
+            return compiled_schedule
+
+        cache_key = "compiled_schedule:{}:{}".format(self.id, self.version)
+        compiled_schedule = cache.get(cache_key)
+        if compiled_schedule is None:
+            # all() rather than values() so that prefetched rows are reused
+            compiled_schedule = CompiledSchedule.from_weekday_schedules(self.weekday_schedules.all())
+            cache.set(cache_key, compiled_schedule, settings.AVAILABILITY_CACHE_TIMEOUT)
+        self._compiled_schedule = (self.version, compiled_schedule)
+        return compiled_schedule
+
+    def get_schedule_intervals(self, start_minutes, end_minutes, custom_schedules=None):
+        if custom_schedules is None:
+            custom_schedules = CustomDateSchedule.get_overlapping_schedules(
+                schedule_ids=[self.id],
+                start_datetime=from_epoch_minutes(start_minutes),
+                end_datetime=from_epoch_minutes(end_minutes)
+            ).values_list("start_datetime", "end_datetime", "start_time", "end_time")
+        return self.get_compiled_schedule().expand(start_minutes, end_minutes, custom_schedules)
 
 
 class WeekDaySchedule(models.Model):
@@ -102,3 +112,40 @@ class CustomDateSchedule(models.Model):
     end_datetime = models.DateTimeField()
     start_time = models.TimeField()
     end_time = models.TimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["schedule", "start_datetime", "end_datetime"]),
+        ]
+
+    @classmethod
+    def get_overlapping_schedules(cls, schedule_ids, start_datetime, end_datetime):
+        return cls.objects.filter(
+            schedule_id__in=schedule_ids,
+            start_datetime__lt=end_datetime,
+            end_datetime__gt=start_datetime
+        ).order_by("schedule_id", "start_datetime")
+
+
+def apply_schedule_row_changes(schedule, model, existing_rows, submitted_rows, fields, group_field):
+    """
+        Brings the schedule's rows of the model in line with the submitted
+        ones in at most one insert, update and delete. Returns the old and new
+        values of every row written.
+    """
+    rows_to_create, rows_to_update, rows_to_delete = diff_schedule_rows(
+        existing_rows, submitted_rows, fields, group_field
+    )
+    changes = [{field: getattr(row, field) for field in fields} for row in rows_to_delete]
+    for row, data in rows_to_update:
+        changes.append({field: getattr(row, field) for field in fields})
+        changes.append(data)
+        for field, value in data.items():
+            setattr(row, field, value)
+    changes += rows_to_create
+
+    model.objects.bulk_create([model(schedule=schedule, **data) for data in rows_to_create])
+    model.objects.bulk_update([row for row, _ in rows_to_update], fields)
+    # Deleted rows only invalidate their own days, see reservations.signals
+    model.objects.filter(pk__in=[row.pk for row in rows_to_delete]).delete()
+    return changes
@@ -31,7 +31,7 @@ class CustomDateScheduleHelperSerializer(serializers.Serializer):
     end_time = serializers.TimeField(validators=[MinutesMultipleOfValidator()])
 
     def validate_date(self, date):
-        if timezone.now().date > date:
+        if timezone.now().date() > date:
             raise serializers.ValidationError("Start date should be in future")
         return date
 
@@ -109,10 +109,24 @@ class ScheduleCreationSerializer(serializers.Serializer):
         rep = super().to_representation(instance)
         user_timezone = self.context.get('request').query_params.get('timezone')
         if user_timezone:
-            weekday_schedules = instance.weekday_schedules.values("day_of_week", "start_time", "end_time")
-            custom_schedules = instance.custom_schedules.values(
-                "start_datetime", "end_datetime", "start_time", "end_time"
-            )
+            # all() reuses the rows prefetched by the viewset
+            weekday_schedules = [
+                {
+                    "day_of_week": weekday_schedule.day_of_week,
+                    "start_time": weekday_schedule.start_time,
+                    "end_time": weekday_schedule.end_time,
+                }
+                for weekday_schedule in instance.weekday_schedules.all()
+            ]
+            custom_schedules = [
+                {
+                    "start_datetime": custom_schedule.start_datetime,
+                    "end_datetime": custom_schedule.end_datetime,
+                    "start_time": custom_schedule.start_time,
+                    "end_time": custom_schedule.end_time,
+                }
+                for custom_schedule in instance.custom_schedules.all()
+            ]
             rep['weekday_schedules'] = convert_weekday_schedules_to_tz(
                 weekday_schedules=weekday_schedules,
                 src_timezone="utc",
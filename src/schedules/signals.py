@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+
+# Sent with a `schedule` argument once weekday/custom rows of a schedule have
+# been written, in bulk or one by one. The `changed_weekdays` (UTC days of
+# week) and `changed_ranges` ((start, end) datetimes of custom days)
+# arguments tell which days changed, every day when they are None.
+schedule_changed = Signal()
@@ -1,3 +1,171 @@
-from django.test import TestCase
+from datetime import datetime, time, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from commons.intervals import to_epoch_minutes
+from .models import Schedule, WeekDaySchedule, CustomDateSchedule
+from .compiled_schedule import CompiledSchedule
+from .utils import diff_schedule_rows
+
+
+class ScheduleQueryCountTest(TestCase):
+    SCHEDULE_COUNT = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+        day_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timezone.timedelta(days=1)
+        for i in range(cls.SCHEDULE_COUNT):
+            schedule = Schedule.objects.create(user=cls.user, name="Schedule {}".format(i))
+            WeekDaySchedule.objects.bulk_create([
+                WeekDaySchedule(schedule=schedule, day_of_week=day_of_week, start_time=time(9), end_time=time(17))
+                for day_of_week in range(5)
+            ])
+            CustomDateSchedule.objects.create(
+                schedule=schedule,
+                start_datetime=day_start,
+                end_datetime=day_start + timezone.timedelta(days=1),
+                start_time=time(10),
+                end_time=time(12)
+            )
+        cls.schedule = schedule
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        # Schedules, then their weekday and custom rows in one query each
+        with self.assertNumQueries(3):
+            resp = self.client.get("/schedule-service/api/schedules", {"timezone": "Asia/Kolkata"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), self.SCHEDULE_COUNT)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(3):
+            resp = self.client.get(
+                "/schedule-service/api/schedules/{}".format(self.schedule.id),
+                {"timezone": "Asia/Kolkata"}
+            )
+        self.assertEqual(resp.status_code, 200)
+
+
+class DiffScheduleRowsTest(SimpleTestCase):
+    FIELDS = ("day_of_week", "start_time", "end_time")
+
+    def row(self, day_of_week, start_hour, end_hour):
+        return WeekDaySchedule(day_of_week=day_of_week, start_time=time(start_hour), end_time=time(end_hour))
+
+    def data(self, day_of_week, start_hour, end_hour):
+        return {"day_of_week": day_of_week, "start_time": time(start_hour), "end_time": time(end_hour)}
+
+    def test_only_changed_rows_are_written(self):
+        kept, changed, removed = self.row(0, 9, 17), self.row(1, 9, 17), self.row(2, 9, 17)
+        rows_to_create, rows_to_update, rows_to_delete = diff_schedule_rows(
+            [kept, changed, removed],
+            [self.data(0, 9, 17), self.data(1, 10, 18), self.data(3, 9, 17)],
+            self.FIELDS,
+            "day_of_week"
+        )
+        self.assertEqual(rows_to_create, [self.data(3, 9, 17)])
+        self.assertEqual(rows_to_update, [(changed, self.data(1, 10, 18))])
+        self.assertEqual(rows_to_delete, [removed])
+
+    def test_duplicate_rows_are_matched_one_to_one(self):
+        first, second = self.row(0, 9, 17), self.row(0, 9, 17)
+        rows_to_create, rows_to_update, rows_to_delete = diff_schedule_rows(
+            [first, second],
+            [self.data(0, 9, 17)],
+            self.FIELDS,
+            "day_of_week"
+        )
+        self.assertEqual((rows_to_create, rows_to_update, rows_to_delete), ([], [], [second]))
+
+
+class ScheduleRowUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+
+    def test_update_keeps_unchanged_rows(self):
+        weekday_data = [
+            {"day_of_week": day, "start_time": time(9), "end_time": time(17)}
+            for day in range(5)
+        ]
+        schedule = Schedule.create_schedule(None, "Schedule", self.user.id, weekday_data, [])
+        row_ids = dict(schedule.weekday_schedules.values_list("day_of_week", "id"))
+        version = schedule.version
+
+        weekday_data[1] = {"day_of_week": 1, "start_time": time(10), "end_time": time(18)}
+        Schedule.create_schedule(schedule, "Schedule", self.user.id, weekday_data[:4], [])
+        schedule.refresh_from_db()
+        self.assertEqual(
+            dict(schedule.weekday_schedules.values_list("day_of_week", "id")),
+            {day: row_ids[day] for day in range(4)}
+        )
+        self.assertEqual(schedule.weekday_schedules.get(day_of_week=1).start_time, time(10))
+        self.assertGreater(schedule.version, version)
+
+        # Nothing changed, nothing is written
+        version = schedule.version
+        with CaptureQueriesContext(connection) as queries:
+            Schedule.create_schedule(schedule, "Schedule", self.user.id, weekday_data[:4], [])
+        self.assertFalse([
+            query["sql"] for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ])
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.version, version)
+
+
+class CompiledScheduleTest(TestCase):
+    # A Monday
+    MONDAY = to_epoch_minutes(datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="organiser", password="password")
+
+    def setUp(self):
+        cache.clear()
+
+    def at(self, days, hour):
+        return self.MONDAY + days * 24 * 60 + hour * 60
+
+    def test_expand_merges_across_midnight(self):
+        compiled_schedule = CompiledSchedule.from_weekday_schedules([
+            WeekDaySchedule(day_of_week=0, start_time=time(13), end_time=time(17)),
+            WeekDaySchedule(day_of_week=0, start_time=time(9), end_time=time(12)),
+            WeekDaySchedule(day_of_week=0, start_time=time(0), end_time=time(1)),
+            WeekDaySchedule(day_of_week=6, start_time=time(22), end_time=time(0)),
+        ])
+        intervals = compiled_schedule.expand(self.at(-1, 0), self.at(7, 0))
+        self.assertEqual(
+            list(zip(intervals.starts.tolist(), intervals.ends.tolist())),
+            [
+                (self.at(-1, 22), self.at(0, 1)),
+                (self.at(0, 9), self.at(0, 12)),
+                (self.at(0, 13), self.at(0, 17)),
+                (self.at(6, 22), self.at(7, 0)),
+            ]
+        )
+
+    def test_compiled_schedule_is_cached_per_version(self):
+        weekday_data = [{"day_of_week": 0, "start_time": time(9), "end_time": time(17)}]
+        schedule = Schedule.create_schedule(None, "Schedule", self.user.id, weekday_data, [])
+        Schedule.objects.get(pk=schedule.pk).get_compiled_schedule()
+        schedule = Schedule.objects.get(pk=schedule.pk)
+        with self.assertNumQueries(0):
+            schedule.get_compiled_schedule()
+
+        weekday_data = [{"day_of_week": 0, "start_time": time(10), "end_time": time(17)}]
+        Schedule.create_schedule(schedule, "Schedule", self.user.id, weekday_data, [])
+        schedule = Schedule.objects.get(pk=schedule.pk)
+        intervals = schedule.get_compiled_schedule().expand(self.at(0, 0), self.at(1, 0))
+        self.assertEqual(intervals.starts.tolist(), [self.at(0, 10)])
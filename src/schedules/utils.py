@@ -1,8 +1,13 @@
 import zoneinfo
+from collections import Counter, defaultdict
 from datetime import time
 
 from django.utils import timezone
 
+from commons.constants import MINUTES_IN_DAY
+from commons.intervals import to_epoch_minutes
+from commons.timezones import get_utc_offset
+
 
 def convert_weekday_schedules_to_tz(weekday_schedules, src_timezone, target_timezone):
     if not weekday_schedules:
@@ -100,50 +105,48 @@ def merge_intervals(intervals):
 def convert_custom_date_schedule_to_tz(custom_schedules, src_timezone, target_timezone):
     src_zone = zoneinfo.ZoneInfo(src_timezone)
     target_zone = zoneinfo.ZoneInfo(target_timezone)
-    curr_datetime = timezone.localtime(timezone.now(), src_zone)
+    # Times are shifted by today's offset difference, looked up once per call
+    now_minutes = to_epoch_minutes(timezone.now())
+    offset_shift = get_utc_offset(now_minutes, target_zone) - get_utc_offset(now_minutes, src_zone)
     updated_schedule = []
     for schedule in custom_schedules:
-        start_datetime = timezone.localtime(schedule["start_datetime"], target_zone)
-        end_datetime = timezone.localtime(schedule["end_datetime"], target_zone)
-        start_time = timezone.localtime(
-            value=curr_datetime.replace(
-                microsecond=0, second=0, minute=schedule["start_time"].minute, hour=schedule["start_time"].hour
-            ),
-            timezone=target_zone
-        ).time()
-        end_time = timezone.localtime(
-            value=curr_datetime.replace(
-                microsecond=0, second=0, minute=schedule["end_time"].minute, hour=schedule["end_time"].hour
-            ),
-            timezone=target_zone
-        ).time()
         updated_schedule.append({
-            "start_datetime": start_datetime,
-            "end_datetime": end_datetime,
-            "start_time": start_time,
-            "end_time": end_time,
+            "start_datetime": schedule["start_datetime"].astimezone(target_zone),
+            "end_datetime": schedule["end_datetime"].astimezone(target_zone),
+            "start_time": shift_time(schedule["start_time"], offset_shift),
+            "end_time": shift_time(schedule["end_time"], offset_shift),
         })
     return updated_schedule
 
 
-def get_datetime_intervals(start_datetime, end_datetime):
-    curr_datetime = start_datetime.replace(microsecond=0, second=0, minute=0, hour=0) + timezone.timedelta(days=1)
-    intervals = []
-    while curr_datetime < end_datetime:
-        intervals.append(
-            {
-                "day_of_week": start_datetime.weekday(),
-                "start_datetime": start_datetime,
-                "end_datetime": curr_datetime
-            }
-        )
-        start_datetime = curr_datetime
-        curr_datetime += timezone.timedelta(days=1)
-    intervals.append(
-        {
-            "day_of_week": start_datetime.weekday(),
-            "start_datetime": start_datetime,
-            "end_datetime": end_datetime
-        }
-    )
-    return intervals
+def shift_time(value, minutes):
+    minutes_of_day = (value.hour * 60 + value.minute + minutes) % MINUTES_IN_DAY
+    return time(minutes_of_day // 60, minutes_of_day % 60)
+
+
+def diff_schedule_rows(existing_rows, submitted_rows, fields, group_field):
+    """
+        Compares the existing rows of a schedule with the submitted row dicts
+        on `fields`. Returns the dicts to create, the (row, dict) pairs to
+        update and the rows to delete; a changed row is updated in place
+        when an old row of the same `group_field` value is left to reuse.
+    """
+    submitted_keys = Counter(tuple(row[field] for field in fields) for row in submitted_rows)
+    stale_rows_by_group = defaultdict(list)
+    for row in existing_rows:
+        key = tuple(getattr(row, field) for field in fields)
+        if submitted_keys[key]:
+            submitted_keys[key] -= 1
+        else:
+            stale_rows_by_group[getattr(row, group_field)].append(row)
+
+    rows_to_create, rows_to_update = [], []
+    for key in submitted_keys.elements():
+        data = dict(zip(fields, key))
+        stale_rows = stale_rows_by_group[data[group_field]]
+        if stale_rows:
+            rows_to_update.append((stale_rows.pop(), data))
+        else:
+            rows_to_create.append(data)
+    rows_to_delete = [row for stale_rows in stale_rows_by_group.values() for row in stale_rows]
+    return rows_to_create, rows_to_update, rows_to_delete
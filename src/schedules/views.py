@@ -13,7 +13,10 @@ class ScheduleCreateApiView(viewsets.ModelViewSet):
     permission_classes = [IsOwner]
 
     def get_queryset(self):
-        return Schedule.objects.filter(user=self.request.user)
+        return Schedule.objects.filter(user=self.request.user).prefetch_related(
+            "weekday_schedules",
+            "custom_schedules"
+        )
 
 
 schedule_router = DefaultRouter(trailing_slash=False)